@@ -0,0 +1,253 @@
+"""Benchmarks for the mortgage engine, from single payments up to full page pipelines.
+
+Each layer is swept over one scaling parameter at a time (down-payment step,
+max discount points, loan term, number of profiles) around a default
+scenario, recording best-of-N wall time and peak traced memory:
+
+    python benchmarks/bench_mortgage.py --output bench.json
+    python benchmarks/bench_mortgage.py --save-baseline            # store benchmarks/baseline.json
+    python benchmarks/bench_mortgage.py --baseline benchmarks/baseline.json --threshold 0.25
+
+With --baseline the run is compared case by case, and the script exits with
+status 1 if any case is slower than baseline * (1 + threshold).
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mortgage_engine import (  # noqa: E402
+    amortization_cube,
+    amortization_frame,
+    amortization_schedule,
+    build_scenario_grid,
+    calculate_monthly_payment,
+    export_chunks,
+    filter_scenarios,
+    iter_frame_chunks,
+    loan_details_table,
+    months_until_ltv_80,
+    profile_scenarios,
+    scenario_columns,
+    scenario_mask,
+    scenario_frame,
+    schedule_for_frame,
+    solve_scenario_grid,
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Default scenario every sweep varies one parameter of (fractions, as the engine takes them)
+SCENARIO = dict(
+    home_price=300_000.0, interest_rate_base=0.06, loan_term=30, max_discount_points=7,
+    min_down_pct=0.0, max_down_pct=1.0, property_tax_rate=0.012, insurance_rate=0.005,
+    pmi_rate=0.005, hoa=250.0, dp_step=0.005,
+)
+CONSTRAINTS = dict(cash_available=150_000.0, monthly_liability=500.0, monthly_income=150_000 / 12,
+                   max_dti=0.43, max_monthly_expense=None)
+
+SWEEPS = {
+    "dp_step": [0.005, 0.001, 0.0001],
+    "max_discount_points": [0, 7, 20],
+    "loan_term": [10, 20, 30],
+}
+PROFILE_COUNTS = [10, 100, 1000]
+QUICK_SWEEPS = {"dp_step": [0.005, 0.001], "max_discount_points": [7], "loan_term": [30]}
+QUICK_PROFILE_COUNTS = [10, 100]
+
+
+def measure(func, repeat):
+    """Best-of-`repeat` wall time, plus peak traced memory from one extra traced run."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 2**20, result
+
+
+def grid_args(params):
+    return {key: value for key, value in params.items() if key != "dp_step"}
+
+
+def scenario_cases(params):
+    """Benchmark cases for one parameter set: name -> (callable, row-count function)."""
+    args = grid_args(params)
+    grid = build_scenario_grid(**args, dp_step=params["dp_step"])
+    df = filter_scenarios(grid, **CONSTRAINTS)
+    df.index += 1
+    loans = df["Loan Amount $"].to_numpy(dtype=float)
+    rates = df["Interest Rate %"].to_numpy(dtype=float) / 100
+    prices = df["Home Price $"].to_numpy(dtype=float)
+    term = params["loan_term"]
+    cube = amortization_cube(loans, rates, term)
+
+    def csv_bytes():
+        buffer = io.BytesIO()
+        export_chunks(iter_frame_chunks(df), buffer, "csv")
+        return buffer
+
+    def scenario_dataframe():
+        mask, dti = scenario_mask(grid, **CONSTRAINTS)
+        return scenario_frame(scenario_columns(grid), mask, dti)
+
+    return {
+        "calculate_monthly_payment (scalar loop)": (
+            lambda: [calculate_monthly_payment(loan, rate, term) for loan, rate in zip(loans[:1000], rates[:1000])],
+            lambda result: len(result),
+        ),
+        "calculate_monthly_payment (vectorized)": (
+            lambda: calculate_monthly_payment(loans, rates, term), len,
+        ),
+        "scenario grid (full grid + filter)": (
+            lambda: filter_scenarios(build_scenario_grid(**args, dp_step=params["dp_step"]), **CONSTRAINTS), len,
+        ),
+        "scenario grid (feasible-range solver + filter)": (
+            lambda: filter_scenarios(
+                solve_scenario_grid(**args, **CONSTRAINTS, dp_step=params["dp_step"]), **CONSTRAINTS
+            ),
+            len,
+        ),
+        "months_until_ltv_80": (lambda: months_until_ltv_80(prices, loans, rates, term), len),
+        "loan_details_table": (lambda: loan_details_table(df), len),
+        "amortization_schedule (per loan, first 200)": (
+            lambda: [amortization_schedule(loan, rate, term) for loan, rate in zip(loans[:200], rates[:200])],
+            lambda result: sum(len(schedule) for schedule in result),
+        ),
+        "amortization cube + frame": (
+            lambda: amortization_frame(df, amortization_cube(loans, rates, term)), len,
+        ),
+        "MonthlySchedule build + rollups": (
+            lambda: (lambda schedule: (schedule.loan_analysis_columns(), schedule.yearly()))(
+                schedule_for_frame(df, term)
+            ),
+            lambda result: len(df),
+        ),
+        "scenario DataFrame build": (scenario_dataframe, len),
+        "scenario CSV export": (csv_bytes, lambda result: len(df)),
+        "amortization CSV export": (
+            lambda: export_chunks(iter_frame_chunks(amortization_frame(df, cube)), io.BytesIO(), "csv"),
+            lambda result: result,
+        ),
+    }
+
+
+def profile_case(count):
+    rng = np.random.default_rng(0)
+    profiles = pd.DataFrame({
+        "home_price": rng.integers(150, 900, count) * 1000.0,
+        "interest_rate_pct": rng.uniform(5, 8, count).round(3),
+        "max_dti_pct": 43.0,
+        "annual_income": rng.integers(50, 400, count) * 1000.0,
+        "cash_available": rng.integers(20, 300, count) * 1000.0,
+        "hoa": 250.0,
+        "property_tax_pct": 1.2,
+        "insurance_pct": 0.5,
+        "pmi_pct": 0.5,
+    }).to_dict("records")
+    return lambda: sum(len(profile_scenarios(profile)) for profile in profiles)
+
+
+def run(sweeps, profile_counts, repeat, only=None):
+    results = []
+
+    def record(case, params, func, rows_of):
+        if only and only not in case:
+            return
+        seconds, peak_mb, result = measure(func, repeat)
+        rows = int(rows_of(result))
+        results.append({"case": case, "params": params, "rows": rows, "seconds": seconds, "peak_mb": peak_mb})
+        print(f"{case:<48} {json.dumps(params):<28} rows={rows:>10,} "
+              f"time={seconds * 1000:>10.2f} ms  peak={peak_mb:>8.1f} MB")
+
+    for name, values in sweeps.items():
+        for value in values:
+            params = dict(SCENARIO, **{name: value})
+            for case, (func, rows_of) in scenario_cases(params).items():
+                record(case, {name: value}, func, rows_of)
+    for count in profile_counts:
+        record("profile_scenarios (sequential)", {"profiles": count}, profile_case(count), lambda rows: rows)
+    return results
+
+
+def case_key(result):
+    return result["case"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results, baseline, threshold):
+    """Print per-case ratios against the baseline and return the regressed cases."""
+    baseline_times = {case_key(result): result["seconds"] for result in baseline["results"]}
+    regressions = []
+    print(f"\nComparison against baseline (threshold +{threshold:.0%}):")
+    for result in results:
+        base = baseline_times.get(case_key(result))
+        if base is None:
+            continue
+        ratio = result["seconds"] / base if base > 0 else float("inf")
+        flag = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"  {result['case']:<48} {json.dumps(result['params']):<28} {ratio:>6.2f}x {flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mortgage engine over scaling parameter grids.")
+    parser.add_argument("--quick", action="store_true", help="Run a reduced grid (smoke test)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the best is kept (default: 3)")
+    parser.add_argument("--only", help="Only run cases whose name contains this text")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown vs baseline before failing, as a fraction (default: 0.25)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also write results to {DEFAULT_BASELINE}")
+    args = parser.parse_args(argv)
+
+    results = run(
+        QUICK_SWEEPS if args.quick else SWEEPS,
+        QUICK_PROFILE_COUNTS if args.quick else PROFILE_COUNTS,
+        args.repeat,
+        args.only,
+    )
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    for path in filter(None, [args.output, DEFAULT_BASELINE if args.save_baseline else None]):
+        with open(path, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed beyond +{args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
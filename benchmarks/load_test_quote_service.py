@@ -0,0 +1,205 @@
+"""Load test for quote_service.py: latency percentiles and throughput on one machine.
+
+Starts the service in a subprocess (or targets a running one with --url),
+then drives it from keep-alive connections:
+
+    python benchmarks/load_test_quote_service.py --requests 5000 --concurrency 64 --workers 4
+    python benchmarks/load_test_quote_service.py --url http://127.0.0.1:8765 --unique 0.2
+
+--unique sets the share of requests with distinct profiles; the rest repeat
+earlier ones and exercise the response cache. Exits with status 1 if any
+request failed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_profiles(count, unique, seed=0):
+    """`count` request bodies of which about `unique` * count are distinct."""
+    rng = np.random.default_rng(seed)
+    distinct = max(1, int(round(count * unique)))
+    pool = [
+        {
+            "home_price": int(rng.integers(150, 900)) * 1000,
+            "interest_rate_pct": round(float(rng.uniform(5, 8)), 3),
+            "max_dti_pct": 43,
+            "annual_income": int(rng.integers(50, 400)) * 1000,
+            "cash_available": int(rng.integers(20, 300)) * 1000,
+            "hoa": 250,
+            "property_tax_pct": 1.2,
+            "insurance_pct": 0.5,
+            "pmi_pct": 0.5,
+        }
+        for _ in range(distinct)
+    ]
+    order = np.concatenate([np.arange(distinct), rng.integers(0, distinct, count - distinct)])
+    rng.shuffle(order)
+    return [pool[i] for i in order]
+
+
+async def _post(reader, writer, host, body):
+    writer.write(
+        f"POST /quote HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    payload = json.loads(await reader.readexactly(length))
+    return status == 200 and "error" not in payload
+
+
+async def run_load(host, port, profiles, concurrency, timeout=10.0):
+    """Send every profile over `concurrency` connections; returns (latencies, failures, elapsed).
+
+    Requests that time out, hit a connection error or get an error response
+    count as failures (latency NaN). A timed-out client stops, so an
+    unresponsive target fails the run instead of hanging it.
+    """
+    queue = iter(enumerate(profiles))
+    latencies = np.full(len(profiles), np.nan)
+
+    async def client():
+        connection = None
+        try:
+            for i, profile in queue:
+                body = json.dumps(profile).encode()
+                try:
+                    if connection is None:
+                        connection = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+                    started = time.perf_counter()
+                    if await asyncio.wait_for(_post(*connection, host, body), timeout):
+                        latencies[i] = time.perf_counter() - started
+                except asyncio.TimeoutError:
+                    return
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    # Reconnect for the next request
+                    if connection is not None:
+                        connection[1].close()
+                    connection = None
+        finally:
+            if connection is not None:
+                connection[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return latencies, int(np.isnan(latencies).sum()), elapsed
+
+
+async def fetch_health(host, port, timeout=10.0):
+    async def fetch():
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f"GET /health HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        raw = await reader.read()
+        writer.close()
+        return json.loads(raw.split(b"\r\n\r\n", 1)[1])
+
+    return await asyncio.wait_for(fetch(), timeout)
+
+
+def wait_until_listening(server):
+    """Block until the started service reports it is listening; raises if it exits first.
+
+    Probing the port instead could reach a stale process still holding it.
+    """
+    line = server.stdout.readline()
+    if not line.startswith(b"Quote service listening"):
+        server.wait()
+        raise RuntimeError(f"quote_service.py exited with status {server.returncode} before listening")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the mortgage quote service.")
+    parser.add_argument("--url", help="Target a running service instead of starting one")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the started service (default: 8765)")
+    parser.add_argument("--workers", type=int, default=None, help="Workers for the started service")
+    parser.add_argument("--max-batch", type=int, default=64, help="--max-batch for the started service")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="--max-wait-ms for the started service")
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests (default: 2000)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent connections (default: 32)")
+    parser.add_argument("--unique", type=float, default=1.0,
+                        help="Share of requests with distinct profiles, 0-1 (default: 1, no cache hits)")
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed requests sent first (default: 50)")
+    parser.add_argument("--timeout", type=float, default=10.0,
+                        help="Seconds before a request counts as failed (default: 10)")
+    parser.add_argument("--output", help="Also write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port = "127.0.0.1", args.port
+        command = [sys.executable, os.path.join(ROOT, "quote_service.py"), "--port", str(port),
+                   "--max-batch", str(args.max_batch), "--max-wait-ms", str(args.max_wait_ms)]
+        if args.workers:
+            command += ["--workers", str(args.workers)]
+        server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE)
+
+    try:
+        if server is not None:
+            wait_until_listening(server)
+        if args.warmup:
+            # Distinct seed so warm-up profiles don't pre-fill the cache for the timed run
+            asyncio.run(run_load(host, port, make_profiles(args.warmup, 1.0, seed=1),
+                                 min(args.concurrency, args.warmup), args.timeout))
+        profiles = make_profiles(args.requests, args.unique)
+        latencies, failures, elapsed = asyncio.run(run_load(host, port, profiles, args.concurrency, args.timeout))
+        try:
+            health = asyncio.run(fetch_health(host, port, args.timeout))
+        except (OSError, asyncio.TimeoutError):
+            health = None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    p50, p99 = np.nanpercentile(latencies, [50, 99]) * 1000 if failures < len(latencies) else (np.nan, np.nan)
+    results = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "unique": args.unique,
+        "failures": failures,
+        "elapsed_s": elapsed,
+        "requests_per_s": args.requests / elapsed,
+        "p50_ms": p50,
+        "p99_ms": p99,
+        "mean_ms": np.nanmean(latencies) * 1000 if failures < len(latencies) else np.nan,
+        "service": health,
+    }
+    print(f"{args.requests:,} requests over {args.concurrency} connections in {elapsed:.2f}s "
+          f"({results['requests_per_s']:,.0f} req/s)")
+    print(f"latency p50 {p50:.1f} ms  p99 {p99:.1f} ms  mean {results['mean_ms']:.1f} ms  failures {failures}")
+    if health is None:
+        print("service: /health did not respond")
+    else:
+        print(f"service: {health['batches']:,} batches, mean batch {health['mean_batch_size']:.1f}, "
+              f"{health['cache_hits']:,} cache hits, {health['coalesced']:,} coalesced")
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Headless batch pricing for borrower profile files.
+
+Streams profiles from a CSV or Parquet file in chunks, prices each chunk on a
+process pool with mortgage_engine, and appends results to the output file as
+chunks finish. Profile columns use the app's sidebar units (see
+mortgage_engine.PROFILE_DEFAULTS and REQUIRED_PROFILE_FIELDS); an optional
+``profile_id`` column is carried through to the output. A profile that
+can't be priced gets an error (the summary's Error column) instead of
+failing its chunk.
+
+    python mortgage_batch.py profiles.parquet results.parquet --workers 8
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from mortgage_engine import ChunkWriter, loan_details_table, profile_scenarios
+
+
+SUMMARY_COLUMNS = [
+    "Profile ID",
+    "Feasible Scenarios",
+    "Lowest Monthly Payment $",
+    "Down % (Lowest Monthly)",
+    "Discount Points (Lowest Monthly)",
+    "Best DTI %",
+    "Lowest Total Cash Used $",
+    "Lowest Closing Cost $",
+    "Error",
+]
+INVALID_PROFILE = "missing, non-positive or out-of-range field"
+
+
+def read_profiles(path, chunksize):
+    """Yield DataFrame chunks of profiles without loading the whole file."""
+    if path.lower().endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def summarize_profile(profile_id, df, error=None):
+    """One summary row per profile, mirroring the app's summary cards."""
+    if df is None or df.empty:
+        return [profile_id, 0] + [np.nan] * (len(SUMMARY_COLUMNS) - 3) + [error]
+    best_payment = df.loc[df["Total Monthly $"].idxmin()]
+    return [
+        profile_id,
+        len(df),
+        best_payment["Total Monthly $"],
+        best_payment["Down %"],
+        best_payment["Discount Points"],
+        df["DTI %"].min(),
+        df["Total Cash Used $"].min(),
+        df["Closing Cost $"].min(),
+        None,
+    ]
+
+
+def process_chunk(chunk, start_row, detail, loan_analysis, solver):
+    """Price every profile in a chunk; runs inside a worker process.
+
+    Returns (results frame or None, [(profile ID, error message), ...]).
+    """
+    summaries, details, errors = [], [], []
+    for offset, profile in enumerate(chunk.to_dict("records")):
+        profile_id = profile.get("profile_id", start_row + offset + 1)
+        try:
+            df = profile_scenarios(profile, solver=solver)
+            error = INVALID_PROFILE if df is None else None
+        except Exception as exc:
+            df, error = None, f"{type(exc).__name__}: {exc}"
+        if error is not None:
+            errors.append((profile_id, error))
+        if not detail:
+            summaries.append(summarize_profile(profile_id, df, error))
+        elif df is not None and not df.empty:
+            if loan_analysis:
+                df = loan_details_table(df).drop(columns=["Loan ID"])
+            df.insert(0, "Profile ID", profile_id)
+            details.append(df)
+    if not detail:
+        # Metric columns stay float (and Error string) so every chunk shares a schema
+        summary = pd.DataFrame(summaries, columns=SUMMARY_COLUMNS).astype(
+            {column: float for column in SUMMARY_COLUMNS[2:-1]} | {"Error": "string"}
+        )
+        return summary, errors
+    return (pd.concat(details, ignore_index=True) if details else None), errors
+
+
+def run_batch(input_path, output_path, chunksize=1000, workers=None, detail=False,
+              loan_analysis=False, solver=True):
+    """Price every profile in input_path and write results to output_path.
+
+    At most two chunks per worker are in flight, so memory stays bounded no
+    matter how large the input is. Results are written in input order.
+    Returns (profiles processed, [(profile ID, error message), ...], elapsed seconds).
+    """
+    workers = workers or os.cpu_count() or 1
+    profiles = 0
+    errors = []
+    started = time.perf_counter()
+
+    def write_next():
+        df, chunk_errors = pending.popleft().result()
+        writer.write(df)
+        errors.extend(chunk_errors)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, ChunkWriter(output_path) as writer:
+        pending = deque()
+        for chunk in read_profiles(str(input_path), chunksize):
+            pending.append(pool.submit(process_chunk, chunk, profiles, detail, loan_analysis, solver))
+            profiles += len(chunk)
+            while len(pending) >= workers * 2:
+                write_next()
+        while pending:
+            write_next()
+    return profiles, errors, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price a file of borrower profiles with the mortgage scenario engine.")
+    parser.add_argument("input", help="Profiles file (.csv or .parquet)")
+    parser.add_argument("output", help="Results file (.csv or .parquet)")
+    parser.add_argument("--chunksize", type=int, default=1000, help="Profiles per chunk (default: 1000)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--detail", action="store_true",
+                        help="Write every feasible scenario instead of one summary row per profile")
+    parser.add_argument("--loan-analysis", action="store_true",
+                        help="With --detail, add the Loan Analysis columns to each scenario")
+    parser.add_argument("--full-grid", action="store_true",
+                        help="Build the full down-payment grid instead of using the feasible-range solver")
+    args = parser.parse_args(argv)
+
+    profiles, errors, elapsed = run_batch(
+        args.input, args.output, chunksize=args.chunksize, workers=args.workers,
+        detail=args.detail, loan_analysis=args.loan_analysis, solver=not args.full_grid,
+    )
+    rate = profiles / elapsed if elapsed > 0 else float("inf")
+    print(f"Processed {profiles:,} profiles in {elapsed:.1f}s ({rate:,.0f} profiles/sec) -> {args.output}")
+    if errors:
+        print(f"{len(errors):,} profiles could not be priced:", file=sys.stderr)
+        for profile_id, error in errors[:10]:
+            print(f"  {profile_id}: {error}", file=sys.stderr)
+        if len(errors) > 10:
+            print(f"  ... and {len(errors) - 10:,} more", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
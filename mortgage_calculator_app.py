@@ -1,9 +1,40 @@
 
+import io
+import json
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from st_aggrid import AgGrid, GridOptionsBuilder
+
+from mortgage_engine import (
+    SCHEDULE_FIELDS,
+    ResultCache,
+    amortization_cube,
+    amortization_frame,
+    build_scenario_grid,
+    export_chunks,
+    iter_amortization_chunks,
+    iter_frame_chunks,
+    iter_monthly_chunks,
+    iter_schedule_chunks,
+    loan_analysis_columns,
+    loan_details_table,
+    normalize_cache_key,
+    pareto_frontier_mask,
+    scenario_columns,
+    scenario_frame,
+    scenario_mask,
+    scenario_objectives,
+    schedule_for_frame,
+    solve_scenario_grid,
+)
+from mortgage_montecarlo import monte_carlo_table
+from mortgage_sweep import affordability_sweep, max_affordable_by_rate, sweep_frame
 
 st.markdown(
     """
@@ -68,123 +99,335 @@ max_discount_points = st.sidebar.number_input(
     help="Maximum number of discount points you are willing to purchase (each point reduces interest rate by 0.25%)."
 )
 
+down_payment_step = st.sidebar.number_input(
+    "Down Payment Step % (Optional)",
+    min_value=0.01,
+    max_value=5.0,
+    value=0.5,
+    step=0.01,
+    format="%.2f",
+    help="Spacing between down-payment percentages tried for each discount-point level."
+)
+
+scenario_engine = st.sidebar.radio(
+    "Scenario Engine",
+    options=["Full grid", "Feasible-range solver"],
+    index=0,
+    help="Full grid builds every down-payment step once, so changing cash, income, DTI or max expense re-filters instantly. "
+         "The solver computes the feasible down-payment range for each point level and only builds rows inside it, "
+         "which keeps very fine steps fast."
+)
+use_solver = scenario_engine == "Feasible-range solver"
+
+scenario_view = st.sidebar.radio(
+    "Scenario View",
+    options=["All feasible", "Pareto frontier"],
+    index=0,
+    help="Pareto frontier hides scenarios that another scenario matches or beats on monthly cost, cash used and total interest."
+)
+pareto_view = scenario_view == "Pareto frontier"
+
+pmi_cancel_ltv = st.sidebar.selectbox(
+    "PMI Cancellation LTV % (Optional)",
+    options=[80.0, 78.0],
+    index=0,
+    help="Loan-to-value at which PMI stops in Loan Analysis: 80% when the borrower requests cancellation, 78% for automatic termination."
+)
+
+low_memory_amortization = st.sidebar.checkbox(
+    "Low-Memory Amortization (Optional)",
+    value=False,
+    help="Store amortization values as float32, halving memory on large runs at the cost of sub-cent precision."
+)
+
+extra_principal = st.sidebar.number_input(
+    "Extra Principal $ / Month (Optional)",
+    min_value=0.0,
+    value=0.0,
+    step=50.0,
+    help="Paid on top of every scheduled payment in Loan Analysis and Amortization, so PMI drops off and the loan is paid off sooner."
+)
+
+table_display = st.sidebar.selectbox(
+    "Table Display",
+    options=["Auto", "Styled table", "Paginated grid"],
+    index=0,
+    help="Paginated grid sends one page of raw numbers at a time and formats them in the browser, "
+         "so large results stay fast. Auto switches to it for large tables."
+)
+table_page_size = st.sidebar.selectbox("Rows per Page (Paginated grid)", options=[100, 250, 500, 1000], index=1)
+
+chart_renderer = st.sidebar.selectbox(
+    "Chart Renderer",
+    options=["Matplotlib image", "Native chart"],
+    index=0,
+    help="Matplotlib image keeps the original static chart (rendered once per scenario set and cached). "
+         "Native chart draws an interactive chart in the browser without loading matplotlib."
+)
+
+stage_timing = st.sidebar.checkbox(
+    "Stage Timing (Debug)",
+    value=os.environ.get("MORTGAGE_STAGE_TIMING", "") not in ("", "0"),
+    help="Time each stage of the run (scenario grid, loan analysis, amortization, tables, chart, exports) "
+         "and show the breakdown in a debug panel. Set MORTGAGE_STAGE_LOG to also append each run to a JSON-lines file."
+)
+
 calculate = st.sidebar.button("🔄 Calculate Scenarios")
 
-# --- Helper Functions ---
-def calculate_monthly_payment(loan_amount, interest_rate, years):
-    r = interest_rate / 12
-    n = years * 12
-    if r == 0:
-        return loan_amount / n
-    return loan_amount * r * (1 + r) ** n / ((1 + r) ** n - 1)
-
-def months_until_ltv_80(home_price, loan_amount, interest_rate, loan_term):
-    """Return number of months PMI is paid until LTV reaches 80%."""
-    monthly_payment = calculate_monthly_payment(loan_amount, interest_rate, loan_term)
-    balance = loan_amount
-    r = interest_rate / 12
-    target_balance = home_price * 0.80
-    months = 0
-    
-    while balance > target_balance and months < loan_term * 12:
-        interest = balance * r
-        principal = monthly_payment - interest
-        balance -= principal
-        months += 1
-        
-    return months
-
-
-def loan_details_table(df):
-    def interest_paid(loan, r, pmt, months):
-        balance = loan
-        interest = 0
-        for _ in range(months):
-            int_paid = balance * r
-            principal = pmt - int_paid
-            balance -= principal
-            interest += int_paid
-        return interest, balance
-
-    records = []
-    for i, row in df.iterrows():
-        loan_amt = row["Loan Amount $"]
-        home_price = row["Home Price $"]
-        rate = row["Interest Rate %"] / 100
-        pmt = calculate_monthly_payment(loan_amt, rate, 30)
-        r = rate / 12
-
-        # Calculate how many months PMI is paid
-        pmi_months = months_until_ltv_80(home_price, loan_amt, rate, 30)
-        pmi_per_month = row["PMI $"]
-        actual_pmi_total = pmi_per_month * pmi_months
-
-        # Total payments until year 5, 10, 15
-        for year in [5, 10, 15]:
-            months = year * 12
-            int_paid, rem_bal = interest_paid(loan_amt, r, pmt, months)
-
-            if pmi_months >= months:
-                total_pmt = (pmt + pmi_per_month) * months
-            else:
-                total_pmt = (pmt + pmi_per_month) * pmi_months + pmt * (months - pmi_months)
-
-            row[f"Total Payment in {year} Years (includes PMI if applicable) $"] = round(total_pmt)
-            row[f"Total Interest in {year} Years $"] = round(int_paid)
-            row[f"Remaining Balance end of Year {year} $"] = round(rem_bal)
-
-        # Total payment and interest for full loan term (30 years)
-        total_int, _ = interest_paid(loan_amt, r, pmt, 360)
-        total_payment = pmt * 360 + actual_pmi_total
-
-        row["Total Payment (includes PMI if applicable) $"] = round(total_payment)
-        row["Total Interest $"] = round(total_int)
-        
-        # Add PMI details
-        row["PMI Months"] = pmi_months
-        row["Total PMI Paid $"] = round(actual_pmi_total)
-        
-        # Add loan ID for tracking
-        row["Loan ID"] = f"Loan {i+1}"
-
-        records.append(row)
-
-    return pd.DataFrame(records)
-
-# --- Amortization Schedule Function ---
-def amortization_schedule(loan_amount, interest_rate, loan_term):
-    """Generate amortization schedule for a given loan."""
-    monthly_payment = calculate_monthly_payment(loan_amount, interest_rate, loan_term)
-    balance = loan_amount
-    r = interest_rate / 12
-    amortization_data = []
-
-    for year in range(1, loan_term + 1):
-        total_principal_paid = 0
-        total_interest_paid = 0
-        for month in range(12):
-            interest_payment = balance * r
-            principal_payment = monthly_payment - interest_payment
-            balance -= principal_payment
-            total_interest_paid += interest_payment
-            total_principal_paid += principal_payment
-            
-        amortization_data.append({
-            "Year": year,
-            "Total Principal Paid $": total_principal_paid,
-            "Total Interest Paid $": total_interest_paid,
-            "Remaining Balance $": balance
-        })
+# --- Result Cache ---
+@st.cache_resource
+def get_result_cache():
+    """Process-wide result cache shared by every session."""
+    return ResultCache(
+        max_entries=int(os.environ.get("MORTGAGE_CACHE_MAX_ENTRIES", 64)),
+        max_bytes=int(float(os.environ.get("MORTGAGE_CACHE_MAX_MB", 256)) * 2**20),
+    )
+
+
+# --- Stage Timing ---
+class StageTimer:
+    """Opt-in wall-clock timings and row counts for each stage of a run."""
+
+    def __init__(self, enabled, log_path=None):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block; set `rows` (and optionally `detail`) on the yielded record."""
+        record = {"stage": name, "rows": None, "detail": None}
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            if self.enabled:
+                record["seconds"] = time.perf_counter() - started
+                self.stages.append(record)
+
+    def frame(self):
+        return pd.DataFrame(self.stages, columns=["stage", "seconds", "rows", "detail"]).rename(columns=str.title)
+
+    def write_log(self, stages=None, **fields):
+        """Append one JSON line (this run's stages, or the given ones) to log_path, if set."""
+        stages = self.stages if stages is None else stages
+        if not (self.enabled and self.log_path and stages):
+            return
+        record = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            **fields,
+            "total_seconds": sum(stage["seconds"] for stage in stages),
+            "stages": stages,
+        }
+        with open(self.log_path, "a") as fh:
+            fh.write(json.dumps(record, default=str) + "\n")
+
+
+timer = StageTimer(stage_timing, os.environ.get("MORTGAGE_STAGE_LOG"))
+# Downloads are built after the run that drew their button, so their timings are kept for the next run's panel
+export_timings = st.session_state.setdefault("stage_export_timings", [])
+session_id = st.session_state.setdefault("stage_session_id", uuid.uuid4().hex[:12])
+
+
+# --- Table Rendering ---
+# Above this many cells, Auto display switches from pandas Styler to the paginated grid
+LARGE_TABLE_CELLS = 50_000
+
+
+def _js_value_formatter(fmt):
+    """Translate one of the app's Python format strings (e.g. "${:,.0f}", "{:.2f}%") to an AG Grid valueFormatter."""
+    from st_aggrid import JsCode
+
+    prefix, rest = fmt.split("{", 1)
+    spec, suffix = rest.split("}", 1)
+    decimals = int(spec.split(".")[1].rstrip("f")) if "." in spec else 0
+    grouping = "true" if "," in spec else "false"
+    return JsCode(f"""
+        function(params) {{
+            if (params.value === null || params.value === undefined) {{ return ''; }}
+            return '{prefix}' + Number(params.value).toLocaleString('en-US', {{
+                minimumFractionDigits: {decimals}, maximumFractionDigits: {decimals}, useGrouping: {grouping}
+            }}) + '{suffix}';
+        }}
+    """)
+
+
+def render_table(df, fmt, key, height=None):
+    """Show a results table with the app's number formats.
+
+    Small tables use pandas Styler as before. Large ones (or any table in
+    "Paginated grid" mode) go through AgGrid one page at a time: only that
+    page's raw numbers are sent, and formatting happens client-side, so render
+    time and payload size don't grow with the row count.
+    """
+    large = table_display == "Paginated grid" or (
+        table_display == "Auto" and df.size > LARGE_TABLE_CELLS
+    )
+    if not large:
+        st.dataframe(df.style.format(fmt).set_properties(**{'text-align': 'center'}), height=height)
+        return "Styler"
+
+    # st_aggrid is only imported once a table actually needs the grid
+    from st_aggrid import AgGrid, GridOptionsBuilder
+
+    pages = max(1, -(-len(df) // table_page_size))
+    page = st.number_input(f"Page (1-{pages:,})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    start = (page - 1) * table_page_size
+    page_df = df.iloc[start:start + table_page_size].reset_index(names="#")
+
+    gb = GridOptionsBuilder.from_dataframe(page_df)
+    gb.configure_default_column(resizable=True, sortable=True, cellStyle={"textAlign": "center"})
+    gb.configure_column("#", pinned="left", width=80)
+    for col, col_fmt in fmt.items():
+        if col in page_df.columns:
+            gb.configure_column(col, type=["numericColumn"], valueFormatter=_js_value_formatter(col_fmt))
+    AgGrid(page_df, gridOptions=gb.build(), height=500, allow_unsafe_jscode=True, key=f"{key}_grid")
+    st.caption(f"Rows {start + 1:,}–{start + len(page_df):,} of {len(df):,}")
+    return "Paginated grid"
+
+
+# Largest home price × rate grid the Affordability Sweep tab will run
+MAX_SWEEP_CELLS = 20_000
+# Most scenarios the Stress Test tab simulates at once
+MAX_STRESS_SCENARIOS = 500
+# Monthly schedule stores larger than this are kept in a memory-mapped temporary file instead of RAM
+SCHEDULE_MEMMAP_BYTES = int(float(os.environ.get("MORTGAGE_SCHEDULE_MEMMAP_MB", 64)) * 2**20)
+
+
+# --- Chart ---
+def chart_png(df):
+    """Render the monthly payment vs down payment chart to PNG bytes.
+
+    Uses a bare matplotlib Figure (no pyplot global state), imported on first
+    use, with the same size and DPI st.pyplot would use.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
+    for points, subset in df.groupby("Discount Points", sort=False):
+        ax.plot(subset["Down %"], subset["Total Monthly $"], marker='o', label=f"{points} points")
+    ax.set_xlabel("Down Payment %")
+    ax.set_ylabel("Total Monthly Payment $")
+    ax.set_title("Monthly Payment vs Down Payment %")
+    ax.legend(title="Discount Points")
+    ax.grid(True)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=200)
+    return buffer.getvalue()
+
+
+def render_chart(df, chart_key):
+    """Draw the payment chart; returns how it was produced (for stage timing).
+
+    Matplotlib PNGs are cached by the scenario fingerprint, so reruns with the
+    same scenarios skip plotting and rasterizing entirely.
+    """
+    if chart_renderer == "Native chart":
+        lines = df.pivot_table(index="Down %", columns="Discount Points", values="Total Monthly $", sort=False)
+        lines.columns = [f"{points} points" for points in lines.columns]
+        st.line_chart(lines.sort_index(), x_label="Down Payment %", y_label="Total Monthly Payment $")
+        return "native"
+    detail = "cache"
+
+    def render():
+        nonlocal detail
+        detail = "rendered"
+        return chart_png(df)
+
+    st.image(get_result_cache().get_or_compute(("chart",) + chart_key, render), width="stretch")
+    return detail
+
+
+# --- Downloads ---
+EXPORT_FORMATS = {"CSV": ("csv", "text/csv"), "Parquet": ("parquet", "application/vnd.apache.parquet")}
+
+
+def download_buttons(label, file_stem, key, make_chunks):
+    """CSV and Parquet download buttons that only build the file when clicked.
+
+    `make_chunks` returns an iterator of DataFrame chunks, which is streamed
+    into a temporary file, so the only full copy held in memory is the final
+    file bytes (no intermediate CSV string).
+    """
+    def build(file_format):
+        started = time.perf_counter()
+        with tempfile.TemporaryFile() as handle:
+            rows = export_chunks(make_chunks(), handle, file_format)
+            handle.seek(0)
+            data = handle.read()
+        if timer.enabled:
+            record = {"stage": f"Export {file_stem}.{file_format}", "seconds": time.perf_counter() - started,
+                      "rows": rows, "detail": f"{len(data):,} bytes"}
+            export_timings.append(record)
+            del export_timings[:-10]
+            timer.write_log([record], session=session_id, event="export")
+        return data
+
+    for col, (name, (file_format, mime)) in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS.items()):
+        col.download_button(
+            f"⬇️ {label} {name}",
+            data=lambda file_format=file_format: build(file_format),
+            file_name=f"{file_stem}.{file_format}",
+            mime=mime,
+            key=f"{key}_{file_format}",
+        )
+
+
+def loan_id_input(label, key, valid_ids, help=None):
+    """Text input of scenario Loan IDs and ranges ("3, 7, 12-20"); returns the matching IDs in scenario order.
+
+    Used instead of a multiselect, which would send every scenario ID to the browser on each rerun.
+    """
+    text = st.text_input(label, key=key, placeholder="e.g. 3, 7, 12-20", help=help)
+    valid_ids = np.asarray(valid_ids)
+    selected = np.zeros(len(valid_ids), dtype=bool)
+    unknown = []
+    for token in text.replace(",", " ").split():
+        first, _, last = token.partition("-")
+        try:
+            in_range = (valid_ids >= int(first)) & (valid_ids <= int(last or first))
+        except ValueError:
+            in_range = None
+        if in_range is None or not in_range.any():
+            unknown.append(token)
+        else:
+            selected |= in_range
+    if unknown:
+        st.warning("Ignoring unknown Loan IDs: " + ", ".join(unknown))
+    return valid_ids[selected].tolist()
+
+
+def session_memo(name, key, compute):
+    """Keep the latest result of `compute` for `key` in this session, recomputing only when the key changes."""
+    memo = st.session_state.get(name)
+    if memo is None or memo[0] != key:
+        memo = (key, compute())
+        st.session_state[name] = memo
+    return memo[1]
 
-    return amortization_data
 
 # --- Main App Tabs ---
 st.title("🏡 Mortgage Scenario Dashboard")
-tab1, tab2, tab3 = st.tabs(["📊 Scenario Analysis", "📈 Loan Analysis", "📉 Amortization Analysis"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(
+    ["📊 Scenario Analysis", "📈 Loan Analysis", "📉 Amortization Analysis", "🗺️ Affordability Sweep",
+     "🎲 Stress Test"]
+)
 
 required_fields = [home_price, interest_rate_base, max_dti, annual_income, cash_available]
 
-if calculate and all(field is not None and field > 0 for field in required_fields):
+# Inputs that change the loan math; everything else only filters the stored grid
+math_key = normalize_cache_key(
+    home_price, interest_rate_base, loan_term, max_discount_points, min_down_pct, max_down_pct,
+    property_tax_rate, insurance_rate, pmi_rate, hoa, down_payment_step, use_solver,
+)
+filter_key = normalize_cache_key(cash_available, monthly_liability, annual_income, max_dti, max_monthly_expense)
+# The solver only builds feasible rows, so its grid also depends on the constraints
+grid_key = math_key + filter_key if use_solver else math_key
+stored_grid = st.session_state.get("scenario_grid")
+grid_ready = stored_grid is not None and stored_grid["math_key"] == math_key
+
+if (calculate or grid_ready) and all(field is not None and field > 0 for field in required_fields):
     property_tax_rate = (property_tax_rate or 0) / 100
     insurance_rate = (insurance_rate or 0) / 100
     pmi_rate = (pmi_rate or 0) / 100
@@ -193,57 +436,216 @@ if calculate and all(field is not None and field > 0 for field in required_field
     max_down_pct = (max_down_pct or 100) / 100
     monthly_income = annual_income / 12
 
-    results = []
-
-    # Iterate from 0 up to and including max_discount_points
-    for points in range(0, int(max_discount_points) + 1):
-        discount = points * 0.0025
-        adjusted_rate = interest_rate_base / 100 - discount
-
-        for dp_pct in np.arange(min_down_pct, max_down_pct + 0.005, 0.005):
-            down_payment = home_price * dp_pct
-            loan_amt = home_price - down_payment
-            closing_cost = loan_amt * (points * 0.01)
-            total_cash = down_payment + closing_cost
-
-            if cash_available is not None and total_cash > cash_available:
-                continue
-
-            principal_interest = calculate_monthly_payment(loan_amt, adjusted_rate, loan_term)
-            property_tax = (home_price * property_tax_rate) / 12
-            insurance = home_price * insurance_rate / 12
-            pmi = (loan_amt * pmi_rate / 12) if dp_pct < 0.20 else 0
-            total_monthly = principal_interest + (hoa or 0) + property_tax + insurance + pmi
-            dti = (total_monthly + (monthly_liability or 0)) / monthly_income
-
-            if (max_monthly_expense is None or total_monthly <= max_monthly_expense) and dti <= max_dti:
-                results.append({
-                    "Home Price $": round(home_price),
-                    "Down %": round(dp_pct * 100, 2),
-                    "Down $": round(down_payment),
-                    "Loan Amount $": round(loan_amt),
-                    "Interest Rate %": round(adjusted_rate * 100, 3),
-                    "Discount Points": points,
-                    "Closing Cost $": round(closing_cost),
-                    "PMI $": round(pmi, 2),
-                    "Total Cash Used $": round(total_cash),
-                    "Monthly P&I $": round(principal_interest, 2),
-                    "Total Monthly $": round(total_monthly, 2),
-                    "DTI %": round(dti * 100, 2)
-                })
-
-    if results:
-        df = pd.DataFrame(results).reset_index(drop=True)
+    result_cache = get_result_cache()
+    scenario_key = math_key + filter_key + (pareto_view,)
+    dp_step = down_payment_step / 100
+
+    def compute_grid():
+        if use_solver:
+            grid = solve_scenario_grid(
+                home_price, interest_rate_base / 100, loan_term, max_discount_points,
+                min_down_pct, max_down_pct, property_tax_rate, insurance_rate, pmi_rate, hoa,
+                cash_available, monthly_liability, monthly_income, max_dti, max_monthly_expense,
+                dp_step=dp_step,
+            )
+        else:
+            grid = build_scenario_grid(
+                home_price, interest_rate_base / 100, loan_term, max_discount_points,
+                min_down_pct, max_down_pct, property_tax_rate, insurance_rate, pmi_rate, hoa,
+                dp_step=dp_step,
+            )
+        return {"key": grid_key, "math_key": math_key, "grid": grid, "columns": scenario_columns(grid)}
+
+    def compute_grid_loan_columns():
+        # Loan-analysis columns for every unfiltered grid row; filters just slice them
+        columns = grid_state["columns"]
+        return loan_analysis_columns(
+            columns["Loan Amount $"],
+            columns["Home Price $"],
+            columns["Interest Rate %"] / 100,
+            columns["PMI $"],
+            pmi_ltv=pmi_cancel_ltv / 100,
+        )
+
+    def selected_rows(loan_ids):
+        # Scenario subset and its grid rows for the chosen Loan IDs (all scenarios when none chosen)
+        if not loan_ids:
+            return df, scenario_rows
+        positions = df.index.get_indexer(loan_ids)
+        return df.iloc[positions], scenario_rows[positions]
+
+    schedule_options = {
+        "escrow": home_price * (property_tax_rate + insurance_rate) / 12,
+        "extra_principal": extra_principal,
+        "pmi_ltv": pmi_cancel_ltv / 100,
+        "dtype": np.float32 if low_memory_amortization else np.float64,
+    }
+
+    def schedule_store(name, loan_ids, term_years):
+        # Month-by-month schedules for the selected scenarios, kept for this session; large
+        # stores are backed by an anonymous memory-mapped temp file rather than RAM
+        subset, _ = selected_rows(loan_ids)
+        key = scenario_key + (tuple(loan_ids), term_years, extra_principal, pmi_cancel_ltv, low_memory_amortization)
+        with timer.stage("Monthly schedule store") as stage:
+            stage["detail"] = "session"
+
+            def build():
+                size = (len(SCHEDULE_FIELDS) * len(subset) * term_years * 12
+                        * np.dtype(schedule_options["dtype"]).itemsize)
+                stage["detail"] = "memmap" if size > SCHEDULE_MEMMAP_BYTES else "memory"
+                return schedule_for_frame(
+                    subset, term_years, **schedule_options,
+                    path=tempfile.TemporaryFile() if size > SCHEDULE_MEMMAP_BYTES else None,
+                )
+
+            schedule = session_memo(f"{name}_schedule", key, build)
+            stage["rows"] = len(schedule) * schedule.months
+        return subset, schedule
+
+    def compute_loan_analysis(loan_ids):
+        if extra_principal:
+            # Extra payments change every horizon, so read them from the monthly schedule store
+            subset, schedule = schedule_store("loan_analysis", loan_ids, 30)
+            df_loan = loan_details_table(subset, columns=schedule.loan_analysis_columns())
+        else:
+            loan_columns = st.session_state["scenario_loan_columns"].get(pmi_cancel_ltv)
+            if loan_columns is None:
+                loan_columns = result_cache.get_or_compute(
+                    ("grid_loan_analysis",) + grid_key + (pmi_cancel_ltv,), compute_grid_loan_columns
+                )
+                st.session_state["scenario_loan_columns"][pmi_cancel_ltv] = loan_columns
+            subset, rows = selected_rows(loan_ids)
+            df_loan = loan_details_table(
+                subset, columns={name: values[rows] for name, values in loan_columns.items()}
+            )
+        # Move PMI-related columns just before the 5-year total payment column
+        cols = df_loan.columns.tolist()
+        insert_at = cols.index("Total Payment in 5 Years (includes PMI if applicable) $")
+        pmi_cols = ["PMI Months", "Total PMI Paid $"]
+        # Remove if they already exist elsewhere to avoid duplicates
+        for col in pmi_cols:
+            if col in cols:
+                cols.remove(col)
+        for i, col in enumerate(pmi_cols):
+            cols.insert(insert_at + i, col)
+
+        # Rows keep their 1-based scenario numbers, so subsets line up with the Scenario table
+        return df_loan[cols]
+
+    def compute_amortization(loan_ids):
+        if extra_principal:
+            # Extra payments reshape every year, so roll up the stored monthly schedules
+            subset, schedule = schedule_store("amortization", loan_ids, loan_term)
+            yearly = schedule.yearly()
+        else:
+            subset, _ = selected_rows(loan_ids)
+            # Generate the amortization schedule for every selected scenario as (scenarios x years) arrays
+            yearly = amortization_cube(
+                subset["Loan Amount $"].to_numpy(),
+                subset["Interest Rate %"].to_numpy() / 100,
+                loan_term,
+                dtype=schedule_options["dtype"],
+            )
+        df_amortization = amortization_frame(subset, yearly)
+        # Ensure the first column in df_amortization is 1-based index
+        df_amortization.index = range(1, len(df_amortization) + 1)
+        return df_amortization
+
+    def compute_sweep(_loan_ids):
+        prices = np.arange(sweep_min_price, sweep_max_price + sweep_price_step / 2, sweep_price_step)
+        rates = np.arange(sweep_min_rate, sweep_max_rate + sweep_rate_step / 2, sweep_rate_step) / 100
+        surface = affordability_sweep(
+            prices, rates, loan_term, max_discount_points, min_down_pct, max_down_pct,
+            property_tax_rate, insurance_rate, pmi_rate, hoa, cash_available, monthly_liability,
+            monthly_income, max_dti, max_monthly_expense, dp_step=dp_step,
+            workers=int(os.environ.get("MORTGAGE_SWEEP_WORKERS", 0)) or None,
+        )
+        return sweep_frame(surface, prices, rates)
+
+    def compute_stress_test(loan_ids):
+        subset, _ = selected_rows(loan_ids)
+        return monte_carlo_table(
+            subset, loan_term,
+            n_paths=stress_paths, seed=stress_seed, horizon_years=stress_horizon,
+            rate_volatility=stress_volatility / 100,
+            arm_fixed_years=stress_arm_years if stress_arm else None,
+            arm_periodic_cap=stress_arm_periodic_cap / 100, arm_lifetime_cap=stress_arm_lifetime_cap / 100,
+            refi_threshold=stress_refi_threshold / 100, refi_probability=stress_refi_probability / 100,
+            refi_cost_pct=stress_refi_cost / 100, extra_principal=stress_extra_principal,
+            annual_sale_rate=stress_sale_rate / 100, pmi_ltv=pmi_cancel_ltv / 100,
+            memory_limit_mb=float(os.environ.get("MORTGAGE_SIMULATION_MEMORY_MB", 64)),
+        )
+
+    def cached_tab_result(name, label, loan_ids, options, compute):
+        # Full tables are shared across sessions; any result is memoized for this session
+        key = (name,) + scenario_key + options + (tuple(loan_ids),)
+        with timer.stage(label) as stage:
+            stage["detail"] = "session"
+
+            def timed_compute():
+                stage["detail"] = "computed"
+                return compute(loan_ids)
+
+            def shared_compute():
+                stage["detail"] = "cache"
+                return result_cache.get_or_compute(key, timed_compute)
+
+            result = session_memo(f"{name}_memo", key, timed_compute if loan_ids else shared_compute)
+            stage["rows"] = len(result)
+        return result
+
+    # The grid is kept per session. In full-grid mode, changing only filter inputs re-applies
+    # masks to it; the solver rebuilds its (small) feasible grid when constraints change.
+    with timer.stage("Scenario grid") as stage:
+        if grid_ready and stored_grid["key"] == grid_key:
+            grid_state = stored_grid
+            stage["detail"] = "session"
+        else:
+            stage["detail"] = "cache"
+
+            def timed_compute_grid():
+                stage["detail"] = "computed"
+                return compute_grid()
+
+            grid_state = result_cache.get_or_compute(("grid",) + grid_key, timed_compute_grid)
+            st.session_state["scenario_grid"] = grid_state
+            st.session_state["scenario_loan_columns"] = {}
+        stage["rows"] = len(grid_state["grid"]["loan_amt"])
+
+    with timer.stage("Scenario filter") as stage:
+        feasible_rows, dti = scenario_mask(grid_state["grid"], cash_available, monthly_liability,
+                                           monthly_income, max_dti, max_monthly_expense)
+        feasible_index = np.flatnonzero(feasible_rows)
+        feasible_count = len(feasible_index)
+        scenario_rows = feasible_index
+        if pareto_view:
+            objectives = scenario_objectives(grid_state["grid"], loan_term)[feasible_index]
+            scenario_rows = feasible_index[pareto_frontier_mask(objectives)]
+            stage["detail"] = "Pareto frontier"
+        df = scenario_frame(grid_state["columns"], scenario_rows, dti)
         df.index += 1
-    
+        stage["rows"] = len(df)
+
+    if not df.empty:
         with tab1:
             st.subheader("📊 Scenario Results")
+            if pareto_view:
+                st.caption(
+                    f"Pareto frontier: showing {len(df):,} of {feasible_count:,} feasible scenarios "
+                    f"({feasible_count - len(df):,} dominated scenarios pruned)."
+                )
 
             # --- Summary Cards ---
-            best_payment = df.loc[df["Total Monthly $"].idxmin()]
-            best_dti = df.loc[df["DTI %"].idxmin()]
-            best_cash = df.loc[df["Total Cash Used $"].idxmin()]
-            best_closing = df.loc[df["Closing Cost $"].idxmin()]
+            # Always over every feasible scenario; the frontier can drop the cheapest closing cost
+            summary_df = df
+            if pareto_view:
+                card_columns = ("Total Monthly $", "Total Cash Used $", "Closing Cost $")
+                summary_df = scenario_frame({name: grid_state["columns"][name] for name in card_columns},
+                                            feasible_index, dti)
+            best_payment = summary_df.loc[summary_df["Total Monthly $"].idxmin()]
+            best_dti = summary_df.loc[summary_df["DTI %"].idxmin()]
+            best_cash = summary_df.loc[summary_df["Total Cash Used $"].idxmin()]
+            best_closing = summary_df.loc[summary_df["Closing Cost $"].idxmin()]
             
             col1, col2, col3, col4 = st.columns(4)
             col1.metric("💰 Lowest Monthly Payment", f"${best_payment['Total Monthly $']:,.2f}")
@@ -252,38 +654,35 @@ if calculate and all(field is not None and field > 0 for field in required_field
             col4.metric("🏁 Lowest Closing Cost", f"${best_closing['Closing Cost $']:,.2f}")
 
             
-            st.dataframe(
-                df.style.format({
-                    "Home Price $": "${:,.0f}",
-                    "Down %": "{:.2f}%",
-                    "Down $": "${:,.0f}",
-                    "Loan Amount $": "${:,.0f}",
-                    "Interest Rate %": "{:.2f}%",
-                    "Discount Points": "{:,.0f}",
-                    "Closing Cost $": "${:,.0f}",
-                    "PMI $": "${:.2f}",
-                    "Total Cash Used $": "${:,.0f}",
-                    "Monthly P&I $": "${:.2f}",
-                    "Total Monthly $": "${:.2f}",
-                    "DTI %": "{:.2f}%"
-                }).set_properties(**{'text-align': 'center'}),
-                height=500 if len(df) > 12 else 'auto'
-            )
+            with timer.stage("Scenario table") as stage:
+                stage["rows"] = len(df)
+                stage["detail"] = render_table(
+                    df,
+                    {
+                        "Home Price $": "${:,.0f}",
+                        "Down %": "{:.2f}%",
+                        "Down $": "${:,.0f}",
+                        "Loan Amount $": "${:,.0f}",
+                        "Interest Rate %": "{:.2f}%",
+                        "Discount Points": "{:,.0f}",
+                        "Closing Cost $": "${:,.0f}",
+                        "PMI $": "${:.2f}",
+                        "Total Cash Used $": "${:,.0f}",
+                        "Monthly P&I $": "${:.2f}",
+                        "Total Monthly $": "${:.2f}",
+                        "DTI %": "{:.2f}%"
+                    },
+                    key="scenario_table",
+                    height=500 if len(df) > 12 else 'auto'
+                )
 
             st.subheader("📈 Monthly Payment vs Down Payment % by Discount Points")
-            fig, ax = plt.subplots(figsize=(10, 5))
-            for points in df["Discount Points"].unique():
-                subset = df[df["Discount Points"] == points]
-                ax.plot(subset["Down %"], subset["Total Monthly $"], marker='o', label=f"{points} points")
-            ax.set_xlabel("Down Payment %")
-            ax.set_ylabel("Total Monthly Payment $")
-            ax.set_title("Monthly Payment vs Down Payment %")
-            ax.legend(title="Discount Points")
-            ax.grid(True)
-            st.pyplot(fig)
-
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button("⬇️ Download Scenarios as CSV", data=csv, file_name="mortgage_scenarios.csv", mime="text/csv")
+            with timer.stage("Chart") as stage:
+                stage["rows"] = len(df)
+                stage["detail"] = render_chart(df, scenario_key)
+
+            download_buttons("Download Scenarios as", "mortgage_scenarios", "scenarios_download",
+                             lambda: iter_frame_chunks(df))
 
             st.subheader("📘 How Calculations Work")
 
@@ -353,106 +752,296 @@ if calculate and all(field is not None and field > 0 for field in required_field
                         </style>
                         """, unsafe_allow_html=True)
 
-            df_loan = loan_details_table(df.copy())
-            # Move PMI-related columns just before the 5-year total payment column
-            cols = df_loan.columns.tolist()
-            insert_at = cols.index("Total Payment in 5 Years (includes PMI if applicable) $")
-            pmi_cols = ["PMI Months", "Total PMI Paid $"]
-            # Remove if they already exist elsewhere to avoid duplicates
-            for col in pmi_cols:
-                if col in cols:
-                    cols.remove(col)
-            for i, col in enumerate(pmi_cols):
-                cols.insert(insert_at + i, col)
-            
-            df_loan = df_loan[cols]
-
-            df_loan.index = range(1, len(df_loan) + 1)  # Set index starting from 1
-            numeric_cols = df_loan.select_dtypes(include='number').columns
-            int_cols = [col for col in numeric_cols if 'Interest' in col or 'Payment' in col or 'Balance' in col or col in ["Home Price $", "Down $", "Loan Amount $", "Discount Points", "Closing Cost $", "Total Cash Used $", "Total PMI Paid $"]]
-            fmt = {}
-            for col in df_loan.columns:
-                if col in ["PMI $", "Monthly P&I $", "Total Monthly $", "Total PMI Paid $"]:
-                    fmt[col] = "${:,.2f}"
-                elif col in ["Down %", "Interest Rate %", "DTI %"]:
-                    fmt[col] = "{:,.2f}%"
-                elif col in ["Home Price $", "Loan Amount $", "Down $", "Closing Cost $", "Total Cash Used $", 
-                                "Total Payment (includes PMI if applicable) $", "Total Interest $"] or \
-                                "Payment" in col or "Interest" in col or "Balance" in col:
-                    fmt[col] = "${:,.0f}"
-                elif col in ["Discount Points", "PMI Months"]:
-                    fmt[col] = "{:,.0f}"
-
-            # Compute dynamic height
-            max_height = "600px" if len(df_loan) > 15 else "auto"
-
-
-            st.dataframe(
-                df_loan.drop(columns=["Loan ID"]).style
-                .format(fmt)
-                .set_properties(**{'text-align': 'center'}),
-                height=500 if len(df_loan) > 12 else 'auto'
-             )
+            loan_analysis_ids = loan_id_input(
+                "Loan IDs (Optional)", "loan_analysis_ids", df.index,
+                help="Limit the analysis to these scenario rows. Leave empty to analyze every scenario."
+            )
+            if not st.checkbox("Compute Loan Analysis", key="compute_loan_analysis"):
+                st.info("Loan analysis is computed on demand. Tick **Compute Loan Analysis** to build it.")
+            else:
+                # The schedule store behind extra-principal runs is float32 in low-memory mode
+                df_loan = cached_tab_result(
+                    "loan_analysis", "Loan analysis", loan_analysis_ids,
+                    (pmi_cancel_ltv, extra_principal, low_memory_amortization), compute_loan_analysis
+                )
+                numeric_cols = df_loan.select_dtypes(include='number').columns
+                int_cols = [col for col in numeric_cols if 'Interest' in col or 'Payment' in col or 'Balance' in col or col in ["Home Price $", "Down $", "Loan Amount $", "Discount Points", "Closing Cost $", "Total Cash Used $", "Total PMI Paid $"]]
+                fmt = {}
+                for col in df_loan.columns:
+                    if col in ["PMI $", "Monthly P&I $", "Total Monthly $", "Total PMI Paid $"]:
+                        fmt[col] = "${:,.2f}"
+                    elif col in ["Down %", "Interest Rate %", "DTI %"]:
+                        fmt[col] = "{:,.2f}%"
+                    elif col in ["Home Price $", "Loan Amount $", "Down $", "Closing Cost $", "Total Cash Used $", 
+                                    "Total Payment (includes PMI if applicable) $", "Total Interest $"] or \
+                                    "Payment" in col or "Interest" in col or "Balance" in col:
+                        fmt[col] = "${:,.0f}"
+                    elif col in ["Discount Points", "PMI Months"]:
+                        fmt[col] = "{:,.0f}"
+
+                # Compute dynamic height
+                max_height = "600px" if len(df_loan) > 15 else "auto"
+
+
+                with timer.stage("Loan analysis table") as stage:
+                    stage["rows"] = len(df_loan)
+                    stage["detail"] = render_table(
+                        df_loan.drop(columns=["Loan ID"]),
+                        fmt,
+                        key="loan_analysis_table",
+                        height=500 if len(df_loan) > 12 else 'auto'
+                    )
             
-            csv_loan = df_loan.to_csv(index=False).encode('utf-8')
-            st.download_button("⬇️ Download Loan Analysis CSV", data=csv_loan, file_name="loan_analysis.csv", mime="text/csv")
+                download_buttons("Download Loan Analysis", "loan_analysis", "loan_analysis_download",
+                                 lambda: iter_frame_chunks(df_loan))
 
         with tab3:
-            st.subheader("📉 Amortization Schedule by Year")
-
-            # Generate amortization schedule for each loan scenario
-            amortization_data = []
-            for i, row in df.iterrows():
-                loan_amt = row["Loan Amount $"]
-                rate = row["Interest Rate %"] / 100
-                yearly_schedule = amortization_schedule(loan_amt, rate, loan_term)
-                for year_data in yearly_schedule:
-                    # Retrieve the specific down_payment and pmi for the current row's scenario
-                    # It's better to get these directly from the 'row' object as they are specific to each scenario.
-                    current_down_payment = row["Down $"] 
-                    current_pmi = row["PMI $"]
-                    
-                    amortization_data.append({
-                        "Loan ID": i,  # Numeric Loan ID
-                        "Home Price $": round(home_price),  # Home Price formatted to 0 decimal places
-                        "Loan Amount $": round(loan_amt),  # Loan Amount formatted to 0 decimal places
-                        "Down Payment $": round(current_down_payment),  # Down Payment formatted to 0 decimal places
-                        "PMI $": round(current_pmi, 2),  # PMI formatted to 2 decimal places
-                        "Year": year_data["Year"],
-                        "Total Principal Paid $": year_data["Total Principal Paid $"],
-                        "Total Interest Paid $": year_data["Total Interest Paid $"],
-                        "Remaining Balance $": year_data["Remaining Balance $"]
-                    })
-
-            # Create a DataFrame for amortization schedule
-            df_amortization = pd.DataFrame(amortization_data)
-
-            # Ensure the first column in df_amortization is 1-based index
-            df_amortization.index = range(1, len(df_amortization) + 1)
-            
-            st.dataframe(df_amortization.style.format({
-                "Home Price $": "${:,.0f}",  # Home Price formatted to 0 decimals
-                "Loan Amount $": "${:,.0f}",  # Loan Amount formatted to 0 decimals
-                "Down Payment $": "${:,.0f}",  # Down Payment formatted to 0 decimals
-                "PMI $": "${:,.2f}",  # PMI formatted to 2 decimals
-                "Total Principal Paid $": "${:,.0f}",
-                "Total Interest Paid $": "${:,.0f}",
-                "Remaining Balance $": "${:,.0f}"
-            }).set_properties(**{'text-align': 'center'}), height=500 if len(df_amortization) > 12 else None)
-
-            # Add option to download the amortization schedule
-            csv_amortization = df_amortization.to_csv(index=False).encode('utf-8')
-            st.download_button("⬇️ Download Amortization Schedule CSV", data=csv_amortization, file_name="amortization_schedule.csv", mime="text/csv")
-    
-            # Reset the DataFrame index so that it starts from 1
-            df_amortization.index = range(1, len(df_amortization) + 1)  # Fix: Starts from 1
-        
+            st.subheader("📉 Amortization Schedule")
+
+            amortization_ids = loan_id_input(
+                "Loan IDs (Optional)", "amortization_ids", df.index,
+                help="Limit the schedule to these scenario rows. Leave empty to include every scenario."
+            )
+            if not st.checkbox("Compute Amortization Schedule", key="compute_amortization"):
+                st.info("Amortization schedules are computed on demand. Tick **Compute Amortization Schedule** to build them.")
+            else:
+                amortization_subset, _ = selected_rows(amortization_ids)
+                granularity = st.radio("Schedule Granularity", options=["Yearly", "Monthly"], horizontal=True,
+                                       key="amortization_granularity")
+                # The month-level store is only built for the Monthly view and extra-principal runs
+                schedule = None
+                if granularity == "Monthly" or extra_principal:
+                    _, schedule = schedule_store("amortization", amortization_ids, loan_term)
+                else:
+                    # Release a store (and its temp file) left over from the Monthly view
+                    st.session_state.pop("amortization_schedule", None)
+                if granularity == "Yearly":
+                    df_amortization = cached_tab_result(
+                        "amortization", "Amortization", amortization_ids,
+                        (low_memory_amortization, extra_principal), compute_amortization
+                    )
+
+                    with timer.stage("Amortization table") as stage:
+                        stage["rows"] = len(df_amortization)
+                        stage["detail"] = render_table(df_amortization, {
+                            "Home Price $": "${:,.0f}",  # Home Price formatted to 0 decimals
+                            "Loan Amount $": "${:,.0f}",  # Loan Amount formatted to 0 decimals
+                            "Down Payment $": "${:,.0f}",  # Down Payment formatted to 0 decimals
+                            "PMI $": "${:,.2f}",  # PMI formatted to 2 decimals
+                            "Total Principal Paid $": "${:,.0f}",
+                            "Total Interest Paid $": "${:,.0f}",
+                            "Remaining Balance $": "${:,.0f}"
+                        }, key="amortization_table", height=500 if len(df_amortization) > 12 else None)
+                else:
+                    if amortization_ids:
+                        audit_id = st.selectbox("Loan ID", options=amortization_ids, key="amortization_audit_id")
+                    else:
+                        # Every scenario: Loan IDs run 1..n, so a number input avoids sending them all
+                        audit_id = int(st.number_input("Loan ID", min_value=1, max_value=len(df), value=1,
+                                                       key="amortization_audit_number"))
+                    position = amortization_subset.index.get_loc(audit_id)
+                    df_monthly = schedule.monthly_frame(amortization_subset.loc[[audit_id]],
+                                                        slice(position, position + 1))
+                    df_monthly.index = range(1, len(df_monthly) + 1)
+                    render_table(
+                        df_monthly.drop(columns=["Loan ID"]),
+                        {col: "${:,.2f}" for col in df_monthly.columns if col.endswith("$")},
+                        key="monthly_table",
+                        height=500,
+                    )
+
+                # Exports read the stored schedules a block of scenarios at a time, or build
+                # each block on the fly when there is no store
+                download_buttons(
+                    "Download Amortization Schedule", "amortization_schedule", "amortization_download",
+                    lambda: iter_schedule_chunks(amortization_subset, schedule) if schedule is not None
+                    else iter_amortization_chunks(amortization_subset, loan_term, dtype=schedule_options["dtype"]),
+                )
+                download_buttons(
+                    "Download Monthly Audit Schedule", "monthly_schedule", "monthly_download",
+                    lambda: iter_schedule_chunks(amortization_subset, schedule, monthly=True) if schedule is not None
+                    else iter_monthly_chunks(amortization_subset, loan_term, **schedule_options),
+                )
+
+        with tab5:
+            st.subheader("🎲 Stress Test (Monte Carlo)")
+            st.caption(
+                "Simulates market-rate paths month by month for each scenario, with optional ARM resets, "
+                "refinancing, extra principal and early sale, and reports 5th / 50th / 95th percentile outcomes. "
+                "Every scenario sees the same simulated paths, so rows compare like for like."
+            )
+            stress_ids = loan_id_input(
+                "Loan IDs (Optional)", "stress_ids", df.index,
+                help=f"Scenarios to simulate. Leave empty to simulate every scenario (up to {MAX_STRESS_SCENARIOS:,})."
+            )
+            sim_cols = st.columns(4)
+            stress_paths = sim_cols[0].number_input("Paths", min_value=100, max_value=20_000, value=1_000, step=100,
+                                                    key="stress_paths")
+            stress_seed = sim_cols[1].number_input("Random Seed", min_value=0, value=42, key="stress_seed")
+            stress_horizon = sim_cols[2].number_input("Horizon (Years)", min_value=1, max_value=int(loan_term),
+                                                      value=int(loan_term), key="stress_horizon")
+            stress_volatility = sim_cols[3].number_input(
+                "Rate Volatility % / Year", min_value=0.0, max_value=5.0, value=1.0, step=0.25, key="stress_volatility",
+                help="Annual standard deviation of market-rate moves (a driftless random walk).")
+
+            refi_cols = st.columns(4)
+            stress_refi_threshold = refi_cols[0].number_input(
+                "Refinance When Rates Drop By %", min_value=0.0, value=1.0, step=0.25, key="stress_refi_threshold")
+            stress_refi_probability = refi_cols[1].number_input(
+                "Refinance Chance % / Month", min_value=0.0, max_value=100.0, value=5.0, step=1.0,
+                key="stress_refi_probability",
+                help="Monthly chance that a borrower who is in the money actually refinances (0 disables refinancing).")
+            stress_refi_cost = refi_cols[2].number_input(
+                "Refinance Cost % of Balance", min_value=0.0, value=2.0, step=0.5, key="stress_refi_cost")
+            stress_extra_principal = refi_cols[3].number_input(
+                "Extra Principal $ / Month", min_value=0.0, value=float(extra_principal), step=50.0,
+                key="stress_extra_principal")
+
+            arm_cols = st.columns(4)
+            stress_arm = arm_cols[0].checkbox("Adjustable Rate (ARM)", key="stress_arm")
+            stress_arm_years = arm_cols[1].number_input(
+                "ARM Fixed Years", min_value=1, max_value=int(loan_term), value=min(5, int(loan_term)),
+                key="stress_arm_years", disabled=not stress_arm)
+            stress_arm_periodic_cap = arm_cols[2].number_input(
+                "ARM Annual Cap %", min_value=0.0, value=2.0, step=0.5, key="stress_arm_periodic_cap",
+                disabled=not stress_arm)
+            stress_arm_lifetime_cap = arm_cols[3].number_input(
+                "ARM Lifetime Cap %", min_value=0.0, value=5.0, step=0.5, key="stress_arm_lifetime_cap",
+                disabled=not stress_arm)
+            stress_sale_rate = st.number_input(
+                "Chance of Selling % / Year", min_value=0.0, max_value=100.0, value=0.0, step=1.0,
+                key="stress_sale_rate", help="Yearly chance the home is sold and the loan paid off early.")
+
+            stress_count = len(stress_ids) if stress_ids else len(df)
+            if stress_count > MAX_STRESS_SCENARIOS:
+                st.error(
+                    f"{stress_count:,} scenarios selected; choose Loan IDs (or use the Pareto frontier view) "
+                    f"to simulate at most {MAX_STRESS_SCENARIOS:,}."
+                )
+            elif not st.checkbox("Run Stress Test", key="compute_stress_test"):
+                st.info("Simulations run on demand. Tick **Run Stress Test** to simulate the selected scenarios.")
+            else:
+                stress_options = normalize_cache_key(
+                    stress_paths, stress_seed, stress_horizon, stress_volatility, stress_refi_threshold,
+                    stress_refi_probability, stress_refi_cost, stress_extra_principal, stress_arm,
+                    stress_arm_years, stress_arm_periodic_cap, stress_arm_lifetime_cap, stress_sale_rate,
+                    pmi_cancel_ltv,
+                )
+                df_stress = cached_tab_result("stress_test", "Stress test", stress_ids, stress_options,
+                                              compute_stress_test)
+                fmt = {"Home Price $": "${:,.0f}", "Down %": "{:.2f}%", "Loan Amount $": "${:,.0f}",
+                       "Interest Rate %": "{:.2f}%", "Discount Points": "{:,.0f}",
+                       "Refinanced %": "{:.1f}%", "Sold %": "{:.1f}%"}
+                for col in df_stress.columns:
+                    if col.startswith(("Total Interest $", "Remaining Balance $")):
+                        fmt[col] = "${:,.0f}"
+                    elif col.startswith("PMI Months"):
+                        fmt[col] = "{:,.1f}"
+                with timer.stage("Stress test table") as stage:
+                    stage["rows"] = len(df_stress)
+                    stage["detail"] = render_table(df_stress, fmt, key="stress_table",
+                                                   height=500 if len(df_stress) > 12 else 'auto')
+
+                download_buttons("Download Stress Test as", "stress_test", "stress_download",
+                                 lambda: iter_frame_chunks(df_stress))
+
     else:
         st.warning("No valid scenarios found based on your input.")
 
+    with tab4:
+        st.subheader("🗺️ Affordability Sweep")
+        st.caption(
+            "Runs the full scenario search (down payment, discount points, PMI, DTI and cash limits) "
+            "for every home price × base interest rate below, using the other sidebar inputs."
+        )
+        price_cols = st.columns(3)
+        sweep_min_price = price_cols[0].number_input(
+            "Min Home Price $", min_value=1_000.0, value=float(round(home_price * 0.5, -3) or 1_000), step=10_000.0,
+            key="sweep_min_price")
+        sweep_max_price = price_cols[1].number_input(
+            "Max Home Price $", min_value=1_000.0, value=float(round(home_price * 1.5, -3) or 1_000), step=10_000.0,
+            key="sweep_max_price")
+        sweep_price_step = price_cols[2].number_input(
+            "Price Step $", min_value=1_000.0, value=float(max(round(home_price * 0.05, -3), 1_000)), step=1_000.0,
+            key="sweep_price_step")
+        rate_cols = st.columns(3)
+        sweep_min_rate = rate_cols[0].number_input(
+            "Min Interest Rate %", min_value=0.0, value=float(max(round(interest_rate_base - 1.5, 2), 0.0)), step=0.25,
+            key="sweep_min_rate")
+        sweep_max_rate = rate_cols[1].number_input(
+            "Max Interest Rate %", min_value=0.0, value=float(round(interest_rate_base + 1.5, 2)), step=0.25,
+            key="sweep_max_rate")
+        sweep_rate_step = rate_cols[2].number_input(
+            "Rate Step %", min_value=0.01, value=0.25, step=0.05, key="sweep_rate_step")
+
+        sweep_cells = (int((sweep_max_price - sweep_min_price) // sweep_price_step) + 1) * \
+            (int(round((sweep_max_rate - sweep_min_rate) / sweep_rate_step)) + 1)
+        if sweep_min_price > sweep_max_price or sweep_min_rate > sweep_max_rate:
+            st.error("Each minimum must not exceed its maximum.")
+        elif sweep_cells > MAX_SWEEP_CELLS:
+            st.error(f"{sweep_cells:,} price × rate cells requested; widen the steps to stay under {MAX_SWEEP_CELLS:,}.")
+        elif not st.checkbox("Run Affordability Sweep", key="compute_sweep"):
+            st.info(f"The sweep covers {sweep_cells:,} price × rate cells. Tick **Run Affordability Sweep** to compute it.")
+        else:
+            sweep_options = normalize_cache_key(
+                sweep_min_price, sweep_max_price, sweep_price_step, sweep_min_rate, sweep_max_rate, sweep_rate_step
+            )
+            sweep_df = cached_tab_result("sweep", "Affordability sweep", [], sweep_options, compute_sweep)
+            affordable = max_affordable_by_rate(sweep_df)
+
+            st.markdown("**Max affordable price by rate**")
+            st.dataframe(affordable.style.format({
+                "Interest Rate %": "{:.3f}%",
+                "Max Affordable Price $": "${:,.0f}",
+                "Feasible Scenarios": "{:,.0f}",
+                "Lowest Monthly $": "${:,.2f}",
+                "Down %": "{:.2f}%",
+                "Discount Points": "{:,.0f}",
+                "Total Cash Used $": "${:,.0f}",
+                "DTI %": "{:.2f}%",
+                "Lowest Total Cash Used $": "${:,.0f}",
+            }, na_rep="—"), hide_index=True)
+
+            heatmap_metric = st.selectbox(
+                "Heatmap Metric",
+                options=["Lowest Monthly $", "Feasible Scenarios", "Lowest Total Cash Used $", "DTI %", "Down %"],
+                key="sweep_heatmap_metric",
+            )
+            # Unaffordable cells are left out, so they show as blanks
+            st.vega_lite_chart(sweep_df[sweep_df["Feasible Scenarios"] > 0], {
+                "mark": "rect",
+                "encoding": {
+                    "x": {"field": "Home Price $", "type": "ordinal", "axis": {"format": "$,.0f"}},
+                    "y": {"field": "Interest Rate %", "type": "ordinal", "sort": "descending"},
+                    "color": {"field": heatmap_metric, "type": "quantitative"},
+                    "tooltip": [{"field": col, "type": "quantitative"} for col in sweep_df.columns],
+                },
+            }, width="stretch")
+
+            download_buttons("Download Sweep as", "affordability_sweep", "sweep_download",
+                             lambda: iter_frame_chunks(sweep_df))
+
 elif calculate:
     st.error("Please fill in all required fields: Home Price, Interest Rate, Annual Income, Max DTI, Cash Available.")
 
+# --- Stage Timing Panel ---
+if timer.enabled:
+    with st.expander("⏱️ Stage Timings (Debug)", expanded=False):
+        if timer.stages:
+            stages = timer.frame()
+            st.dataframe(stages.style.format({"Seconds": "{:.4f}", "Rows": "{:,.0f}"}, na_rep=""), hide_index=True)
+            st.caption(f"Timed stages took {stages['Seconds'].sum():.3f}s this run.")
+        else:
+            st.caption("No stages ran this time.")
+        if export_timings:
+            st.markdown("**Recent downloads**")
+            st.dataframe(pd.DataFrame(export_timings).rename(columns=str.title), hide_index=True)
+    timer.write_log(
+        session=session_id, event="run", scenario_engine=scenario_engine, scenario_view=scenario_view,
+        down_payment_step=down_payment_step, max_discount_points=max_discount_points, loan_term=loan_term,
+        table_display=table_display,
+    )
+
 # --- Footer ---
 st.markdown("---", unsafe_allow_html=True)
 st.markdown(
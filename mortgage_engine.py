@@ -0,0 +1,777 @@
+"""Mortgage scenario math shared by the Streamlit app and the batch tools (no Streamlit import)."""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# --- Helper Functions ---
+def calculate_monthly_payment(loan_amount, interest_rate, years):
+    """Monthly P&I payment. Accepts scalars or NumPy arrays (broadcast together)."""
+    loan_amount = np.asarray(loan_amount, dtype=float)
+    r = np.asarray(interest_rate, dtype=float) / 12
+    n = np.asarray(years, dtype=float) * 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (1 + r) ** n
+        payment = np.where(r == 0, loan_amount / n, loan_amount * r * growth / (growth - 1))
+    return payment[()] if payment.ndim == 0 else payment
+
+def months_until_ltv_80(home_price, loan_amount, interest_rate, loan_term, ltv=0.80):
+    """Return number of months PMI is paid until the balance reaches `ltv` of the home price.
+
+    Solves the amortization balance for the crossing month with a logarithm, so
+    it accepts arrays of prices, loan amounts, rates and terms and returns an
+    int64 array (a plain int for scalar input). Use ltv=0.78 for automatic
+    PMI termination.
+    """
+    home_price = np.asarray(home_price, dtype=float)
+    loan_amount = np.asarray(loan_amount, dtype=float)
+    r = np.asarray(interest_rate, dtype=float) / 12
+    n = np.asarray(loan_term, dtype=float) * 12
+    monthly_payment = calculate_monthly_payment(loan_amount, interest_rate, loan_term)
+    target_balance = home_price * ltv
+
+    # Balance after k payments is A + (P - A) * (1 + r)^k with A = payment / r,
+    # so it first drops to the target at k = log((A - T) / (A - P)) / log(1 + r).
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = monthly_payment / r
+        crossing = np.log((annuity - target_balance) / (annuity - loan_amount)) / np.log1p(r)
+        crossing = np.where(r == 0, (loan_amount - target_balance) / monthly_payment, crossing)
+    # Nudge exact crossings below the next integer so float noise doesn't add a month
+    months = np.ceil(np.nan_to_num(crossing, nan=np.inf) - 1e-9)
+    months = np.where(loan_amount <= target_balance, 0, np.clip(months, 0, n)).astype(np.int64)
+    return int(months) if months.ndim == 0 else months
+
+
+def remaining_balance(loan_amount, interest_rate, payment, months):
+    """Closed-form balance left after `months` level payments (works on arrays)."""
+    loan_amount = np.asarray(loan_amount, dtype=float)
+    r = np.asarray(interest_rate, dtype=float) / 12
+    months = np.asarray(months, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (1 + r) ** months
+        balance = np.where(
+            r == 0,
+            loan_amount - payment * months,
+            loan_amount * growth - payment * (growth - 1) / r,
+        )
+    return balance[()] if balance.ndim == 0 else balance
+
+
+def cumulative_interest(loan_amount, interest_rate, payment, months):
+    """Closed-form interest paid over the first `months` payments (works on arrays)."""
+    balance = remaining_balance(loan_amount, interest_rate, payment, months)
+    return payment * np.asarray(months, dtype=float) - (loan_amount - balance), balance
+
+
+def loan_analysis_columns(loan_amt, home_price, rate, pmi_per_month, horizons=(5, 10, 15),
+                          term_years=30, pmi_ltv=0.80):
+    """Horizon totals, full-term totals and PMI details for arrays of loans, as a dict of columns.
+
+    Uses the closed-form amortization formulas over whole columns, so each
+    horizon costs O(1) per loan regardless of its length. `rate` is a fraction.
+    """
+    loan_amt = np.asarray(loan_amt, dtype=float)
+    pmi_per_month = np.asarray(pmi_per_month, dtype=float)
+    term_months = term_years * 12
+    pmt = calculate_monthly_payment(loan_amt, rate, term_years)
+    columns = {}
+
+    # Calculate how many months PMI is paid (none for loans that aren't charged PMI)
+    pmi_months = months_until_ltv_80(home_price, loan_amt, rate, term_years, ltv=pmi_ltv)
+    pmi_months = np.where(pmi_per_month > 0, pmi_months, 0)
+    actual_pmi_total = pmi_per_month * pmi_months
+
+    # Total payments until each horizon year
+    for year in horizons:
+        months = min(year * 12, term_months)
+        int_paid, rem_bal = cumulative_interest(loan_amt, rate, pmt, months)
+        total_pmt = pmt * months + pmi_per_month * np.minimum(pmi_months, months)
+
+        columns[f"Total Payment in {year} Years (includes PMI if applicable) $"] = np.round(total_pmt).astype(np.int64)
+        columns[f"Total Interest in {year} Years $"] = np.round(int_paid).astype(np.int64)
+        columns[f"Remaining Balance end of Year {year} $"] = np.round(rem_bal).astype(np.int64)
+
+    # Total payment and interest for the full loan term
+    total_int, _ = cumulative_interest(loan_amt, rate, pmt, term_months)
+    total_payment = pmt * term_months + actual_pmi_total
+
+    columns["Total Payment (includes PMI if applicable) $"] = np.round(total_payment).astype(np.int64)
+    columns["Total Interest $"] = np.round(total_int).astype(np.int64)
+
+    # Add PMI details
+    columns["PMI Months"] = pmi_months
+    columns["Total PMI Paid $"] = np.round(actual_pmi_total).astype(np.int64)
+    return columns
+
+
+def loan_details_table(df, horizons=(5, 10, 15), term_years=30, pmi_ltv=0.80, columns=None):
+    """Add horizon totals, full-term totals and PMI details to every scenario row at once.
+
+    `columns` may hold loan_analysis_columns already computed for exactly these
+    rows (e.g. sliced from the unfiltered grid), in which case nothing is recomputed.
+    """
+    if columns is None:
+        columns = loan_analysis_columns(
+            df["Loan Amount $"].to_numpy(dtype=float),
+            df["Home Price $"].to_numpy(dtype=float),
+            df["Interest Rate %"].to_numpy(dtype=float) / 100,
+            df["PMI $"].to_numpy(dtype=float),
+            horizons=horizons,
+            term_years=term_years,
+            pmi_ltv=pmi_ltv,
+        )
+    df = df.assign(**columns)
+
+    # Add loan ID for tracking
+    df["Loan ID"] = [f"Loan {i + 1}" for i in df.index]
+
+    return df
+
+
+# --- Scenario Grid Engine ---
+def scenario_metrics(home_price, interest_rate_base, loan_term, points, dp_pct,
+                     property_tax_rate, insurance_rate, pmi_rate, hoa):
+    """Scenario columns for broadcastable `points` / `dp_pct` arrays, flattened to 1-D.
+
+    `home_price` and `interest_rate_base` may also be arrays broadcasting with
+    them (as in the affordability sweep).
+    """
+    adjusted_rate = interest_rate_base - points * 0.0025
+    down_payment = home_price * dp_pct
+    loan_amt = home_price - down_payment
+    closing_cost = loan_amt * (points * 0.01)
+    total_cash = down_payment + closing_cost
+
+    principal_interest = calculate_monthly_payment(loan_amt, adjusted_rate, loan_term)
+    property_tax = (home_price * property_tax_rate) / 12
+    insurance = home_price * insurance_rate / 12
+    pmi = np.where(dp_pct < 0.20, loan_amt * pmi_rate / 12, 0.0)
+    total_monthly = principal_interest + (hoa or 0) + property_tax + insurance + pmi
+
+    shape = np.broadcast_shapes(np.shape(home_price), np.shape(interest_rate_base),
+                                np.shape(points), np.shape(dp_pct))
+
+    def flat(values):
+        return np.broadcast_to(values, shape).ravel()
+
+    return {
+        "home_price": flat(np.asarray(home_price, dtype=float)),
+        "dp_pct": flat(dp_pct),
+        "down_payment": flat(down_payment),
+        "loan_amt": flat(loan_amt),
+        "adjusted_rate": flat(adjusted_rate),
+        "points": flat(points),
+        "closing_cost": flat(closing_cost),
+        "pmi": flat(pmi),
+        "total_cash": flat(total_cash),
+        "principal_interest": flat(principal_interest),
+        "total_monthly": flat(total_monthly),
+    }
+
+
+def build_scenario_grid(home_price, interest_rate_base, loan_term, max_discount_points,
+                        min_down_pct, max_down_pct, property_tax_rate, insurance_rate,
+                        pmi_rate, hoa, dp_step=0.005):
+    """Compute every (discount points, down %) scenario as flat NumPy columns in one pass.
+
+    Rates and down-payment bounds are fractions (0.06, not 6). Rows are ordered
+    points-major, down %-minor, matching the original nested loop.
+    """
+    points = np.arange(0, int(max_discount_points) + 1)
+    dp_pcts = np.arange(min_down_pct, max_down_pct + dp_step, dp_step)
+    return scenario_metrics(home_price, interest_rate_base, loan_term, points[:, None], dp_pcts[None, :],
+                            property_tax_rate, insurance_rate, pmi_rate, hoa)
+
+
+def feasible_down_payment_ranges(home_price, interest_rate_base, loan_term, max_discount_points,
+                                 min_down_pct, max_down_pct, property_tax_rate, insurance_rate,
+                                 pmi_rate, hoa, cash_available, monthly_liability, monthly_income,
+                                 max_dti, max_monthly_expense):
+    """Exact feasible down-payment intervals for each discount-point level.
+
+    For a fixed point count, cash used rises and total monthly falls with the
+    down payment inside each PMI regime, so every constraint is a bound on
+    down %. PMI stops at 20% down, which splits the feasible set into at most
+    a PMI interval [lo, 0.20) and a no-PMI interval [lo, hi]. Returns
+    {points: [(lo, hi), ...]} with empty lists for infeasible levels.
+    """
+    monthly_cap = max_dti * monthly_income - (monthly_liability or 0)
+    if max_monthly_expense is not None:
+        monthly_cap = min(monthly_cap, max_monthly_expense)
+    fixed_monthly = (hoa or 0) + home_price * property_tax_rate / 12 + home_price * insurance_rate / 12
+    max_loan_payment = monthly_cap - fixed_monthly
+
+    ranges = {}
+    for points in range(0, int(max_discount_points) + 1):
+        cost_pct = points * 0.01
+        payment_factor = calculate_monthly_payment(1.0, interest_rate_base - points * 0.0025, loan_term)
+
+        upper = max_down_pct
+        if cash_available is not None:
+            # down + closing = price * (dp * (1 - cost_pct) + cost_pct) <= cash
+            upper = min(upper, (cash_available / home_price - cost_pct) / (1 - cost_pct))
+
+        # price * (1 - dp) * (payment factor + monthly PMI rate) + fixed <= cap
+        lower_pmi = 1 - max_loan_payment / (home_price * (payment_factor + pmi_rate / 12))
+        lower_no_pmi = 1 - max_loan_payment / (home_price * payment_factor)
+
+        intervals = []
+        lo, hi = max(min_down_pct, lower_pmi), min(upper, 0.20)
+        if lo < hi:
+            intervals.append((lo, hi))
+        lo, hi = max(min_down_pct, lower_no_pmi, 0.20), upper
+        if lo <= hi:
+            intervals.append((lo, hi))
+        ranges[points] = intervals
+    return ranges
+
+
+def solve_scenario_grid(home_price, interest_rate_base, loan_term, max_discount_points,
+                        min_down_pct, max_down_pct, property_tax_rate, insurance_rate,
+                        pmi_rate, hoa, cash_available, monthly_liability, monthly_income,
+                        max_dti, max_monthly_expense, dp_step=0.005):
+    """Like build_scenario_grid, but only generates the down-payment steps inside the feasible ranges.
+
+    Each interval is widened by a hair so rounding never drops a boundary row;
+    scenario_mask still decides feasibility exactly.
+    """
+    # Same down-payment lattice as the full grid (including np.arange's occasional
+    # step past max_down_pct), so both modes yield identical rows
+    dp_pcts = np.arange(min_down_pct, max_down_pct + dp_step, dp_step)
+    ranges = feasible_down_payment_ranges(
+        home_price, interest_rate_base, loan_term, max_discount_points, min_down_pct,
+        dp_pcts[-1] if len(dp_pcts) else max_down_pct,
+        property_tax_rate, insurance_rate, pmi_rate, hoa, cash_available, monthly_liability,
+        monthly_income, max_dti, max_monthly_expense,
+    )
+    tolerance = 1e-6
+    points, steps = [], []
+    for level, intervals in ranges.items():
+        level_steps = [
+            np.arange(
+                max(int(np.ceil((lo - min_down_pct) / dp_step - tolerance)), 0),
+                min(int(np.floor((hi - min_down_pct) / dp_step + tolerance)), len(dp_pcts) - 1) + 1,
+            )
+            for lo, hi in intervals
+        ]
+        # The PMI and no-PMI intervals can share the 20% step once widened
+        level_steps = np.unique(np.concatenate(level_steps)) if level_steps else []
+        steps.append(level_steps)
+        points.append(np.full(len(level_steps), level))
+
+    if not points:
+        # No point levels at all (max_discount_points < 0)
+        points = steps = [np.empty(0)]
+    points = np.concatenate(points).astype(np.int64)
+    steps = np.concatenate(steps).astype(np.int64)
+    return scenario_metrics(home_price, interest_rate_base, loan_term, points, dp_pcts[steps],
+                            property_tax_rate, insurance_rate, pmi_rate, hoa)
+
+
+def scenario_columns(grid):
+    """Rounded display columns (everything except DTI) for every row of the unfiltered grid."""
+    return {
+        "Home Price $": np.round(grid["home_price"]).astype(np.int64),
+        "Down %": np.round(grid["dp_pct"] * 100, 2),
+        "Down $": np.round(grid["down_payment"]).astype(np.int64),
+        "Loan Amount $": np.round(grid["loan_amt"]).astype(np.int64),
+        "Interest Rate %": np.round(grid["adjusted_rate"] * 100, 3),
+        "Discount Points": grid["points"].astype(np.int64),
+        "Closing Cost $": np.round(grid["closing_cost"]).astype(np.int64),
+        "PMI $": np.round(grid["pmi"], 2),
+        "Total Cash Used $": np.round(grid["total_cash"]).astype(np.int64),
+        "Monthly P&I $": np.round(grid["principal_interest"], 2),
+        "Total Monthly $": np.round(grid["total_monthly"], 2),
+    }
+
+
+def scenario_mask(grid, cash_available, monthly_liability, monthly_income,
+                  max_dti, max_monthly_expense):
+    """Boolean mask of grid rows passing the cash / DTI / max-expense constraints, plus every row's DTI."""
+    dti = (grid["total_monthly"] + (monthly_liability or 0)) / monthly_income
+
+    mask = dti <= max_dti
+    if cash_available is not None:
+        mask &= grid["total_cash"] <= cash_available
+    if max_monthly_expense is not None:
+        mask &= grid["total_monthly"] <= max_monthly_expense
+    return mask, dti
+
+
+def scenario_frame(columns, rows, dti):
+    """Build the scenario DataFrame from precomputed grid columns and a row mask or index array."""
+    df = pd.DataFrame({name: values[rows] for name, values in columns.items()})
+    df["DTI %"] = np.round(dti[rows] * 100, 2)
+    return df
+
+
+def filter_scenarios(grid, cash_available, monthly_liability, monthly_income,
+                     max_dti, max_monthly_expense):
+    """Apply the cash / DTI / max-expense constraints as boolean masks and build the DataFrame."""
+    mask, dti = scenario_mask(grid, cash_available, monthly_liability, monthly_income,
+                              max_dti, max_monthly_expense)
+    return scenario_frame(scenario_columns(grid), mask, dti)
+
+
+# --- Pareto Frontier ---
+def scenario_objectives(grid, loan_term):
+    """Monthly cost, cash used and total interest per grid row (all minimized) as an (n, 3) array."""
+    total_interest = grid["principal_interest"] * loan_term * 12 - grid["loan_amt"]
+    return np.column_stack([grid["total_monthly"], grid["total_cash"], total_interest])
+
+
+def pareto_frontier_mask(objectives):
+    """Boolean mask of rows no other row dominates on an (n, 3) array of minimized objectives.
+
+    Sort-based sweep in O(n log n): after sorting lexicographically, a row is
+    dominated exactly when an earlier row has both a smaller-or-equal second
+    and third objective, which a Fenwick tree of prefix minima (indexed by the
+    rank of the second objective) answers in O(log n). Identical rows do not
+    dominate each other.
+    """
+    objectives = np.asarray(objectives, dtype=float)
+    if len(objectives) == 0:
+        return np.zeros(0, dtype=bool)
+    unique_rows, inverse = np.unique(objectives, axis=0, return_inverse=True)
+    second_rank = (np.unique(unique_rows[:, 1], return_inverse=True)[1] + 1).tolist()
+    third = unique_rows[:, 2].tolist()
+
+    size = max(second_rank) + 1
+    tree = [float("inf")] * size
+    keep = np.zeros(len(unique_rows), dtype=bool)
+    for i, (rank, value) in enumerate(zip(second_rank, third)):
+        j = rank
+        while j > 0 and tree[j] > value:
+            j -= j & -j
+        if j > 0:
+            continue
+        keep[i] = True
+        # Only frontier rows need inserting: anything a dominated row beats, a frontier row beats too
+        j = rank
+        while j < size:
+            if value < tree[j]:
+                tree[j] = value
+            j += j & -j
+    return keep[inverse.reshape(-1)]
+
+
+# --- Amortization Schedule Function ---
+def amortization_cube(loan_amounts, interest_rates, loan_term, dtype=np.float64):
+    """Yearly principal, interest and remaining balance for many loans at once.
+
+    Returns a dict of (scenarios x years) arrays keyed "principal", "interest"
+    and "balance". Values are computed in float64 from the closed-form balance
+    at each year end; pass dtype=np.float32 to halve the memory they hold.
+    """
+    loan_amounts = np.asarray(loan_amounts, dtype=float)[:, None]
+    interest_rates = np.asarray(interest_rates, dtype=float)[:, None]
+    monthly_payment = calculate_monthly_payment(loan_amounts, interest_rates, loan_term)
+    year_end_months = np.arange(0, loan_term + 1)[None, :] * 12
+    balance = remaining_balance(loan_amounts, interest_rates, monthly_payment, year_end_months)
+
+    principal = balance[:, :-1] - balance[:, 1:]
+    interest = monthly_payment * 12 - principal
+    return {
+        "principal": principal.astype(dtype, copy=False),
+        "interest": interest.astype(dtype, copy=False),
+        "balance": balance[:, 1:].astype(dtype, copy=False),
+    }
+
+
+def amortization_schedule(loan_amount, interest_rate, loan_term):
+    """Generate amortization schedule for a given loan."""
+    cube = amortization_cube([loan_amount], [interest_rate], loan_term)
+    return [
+        {
+            "Year": year,
+            "Total Principal Paid $": float(principal),
+            "Total Interest Paid $": float(interest),
+            "Remaining Balance $": float(balance),
+        }
+        for year, principal, interest, balance in zip(
+            range(1, loan_term + 1), cube["principal"][0], cube["interest"][0], cube["balance"][0]
+        )
+    ]
+
+
+def amortization_frame(df, cube):
+    """Build the long-format (scenario, year) amortization DataFrame from a cube without row loops."""
+    n_years = cube["balance"].shape[1]
+
+    def per_year(column):
+        return np.repeat(df[column].to_numpy(), n_years)
+
+    return pd.DataFrame({
+        "Loan ID": np.repeat(df.index.to_numpy(), n_years),
+        "Home Price $": per_year("Home Price $"),
+        "Loan Amount $": per_year("Loan Amount $"),
+        "Down Payment $": per_year("Down $"),
+        "PMI $": per_year("PMI $"),
+        "Year": np.tile(np.arange(1, n_years + 1), len(df)),
+        "Total Principal Paid $": cube["principal"].ravel(),
+        "Total Interest Paid $": cube["interest"].ravel(),
+        "Remaining Balance $": cube["balance"].ravel(),
+    })
+
+# --- Monthly Schedule Store ---
+SCHEDULE_FIELDS = ("balance", "interest", "principal", "extra", "pmi", "escrow")
+
+
+class MonthlySchedule:
+    """Month-by-month schedules for many loans, stored as one (fields x scenarios x months) array.
+
+    Each month holds the ending balance, interest, scheduled principal, extra
+    principal, PMI and escrow, all filled in closed form a block of scenarios
+    at a time. PMI is charged while the balance owed at the start of the month
+    is above `pmi_ltv` of the home price, and extra principal shortens the loan.
+    Pass `path` (a filename or an open binary file such as
+    tempfile.TemporaryFile()) to back the array with np.memmap instead of RAM.
+
+    Loan analysis horizons, PMI months and yearly rollups are all read from the
+    stored months by slicing; nothing is re-simulated.
+    """
+
+    def __init__(self, loan_amounts, interest_rates, home_prices, pmi_payments, loan_term,
+                 escrow=0.0, extra_principal=0.0, pmi_ltv=0.80, dtype=np.float64, path=None,
+                 chunk_scenarios=2_000):
+        self.loan_amounts = np.asarray(loan_amounts, dtype=float)
+        self.interest_rates = np.asarray(interest_rates, dtype=float)
+        n = len(self.loan_amounts)
+        self.loan_term = int(loan_term)
+        self.months = self.loan_term * 12
+        self.payment = np.atleast_1d(calculate_monthly_payment(self.loan_amounts, self.interest_rates, self.loan_term))
+        self.pmi_target = np.broadcast_to(np.asarray(home_prices, dtype=float) * pmi_ltv, (n,))
+        pmi_payments = np.broadcast_to(np.asarray(pmi_payments, dtype=float), (n,))
+        self.pmi_payments = pmi_payments
+        escrow = np.broadcast_to(np.asarray(escrow, dtype=float), (n,))
+        extra_principal = np.broadcast_to(np.asarray(extra_principal, dtype=float), (n,))
+
+        shape = (len(SCHEDULE_FIELDS), n, self.months)
+        if path is None:
+            self.data = np.empty(shape, dtype=dtype)
+        else:
+            self.data = np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+        for field, values in zip(SCHEDULE_FIELDS, self.data):
+            setattr(self, field, values)
+
+        month_numbers = np.arange(1, self.months + 1)[None, :]
+        for start in range(0, n, chunk_scenarios):
+            rows = slice(start, min(start + chunk_scenarios, n))
+            loan = self.loan_amounts[rows, None]
+            payment = self.payment[rows, None]
+            # A level payment of (payment + extra) leaves the closed-form balance below, until it is paid off
+            balance = remaining_balance(loan, self.interest_rates[rows, None],
+                                        payment + extra_principal[rows, None], month_numbers)
+            balance = np.where(balance < 0.005, 0.0, balance)
+            opening = np.concatenate([loan, balance[:, :-1]], axis=1)
+            interest = opening * self.interest_rates[rows, None] / 12
+            principal = np.minimum(payment - interest, opening)
+
+            self.balance[rows] = balance
+            self.interest[rows] = interest
+            self.principal[rows] = principal
+            extra = opening - balance - principal
+            self.extra[rows] = np.where(extra < 0.005, 0.0, extra)
+            self.pmi[rows] = np.where(opening > self.pmi_target[rows, None], pmi_payments[rows, None], 0.0)
+            self.escrow[rows] = np.where(opening > 0, escrow[rows, None], 0.0)
+
+    def __len__(self):
+        return self.data.shape[1]
+
+    def opening_balance(self, rows=slice(None)):
+        """Balance owed at the start of each month."""
+        return np.concatenate([self.loan_amounts[rows, None], self.balance[rows, :-1]], axis=1)
+
+    def pmi_months(self):
+        """Months charged PMI, i.e. starting the month above the PMI target balance with a PMI payment."""
+        over_target = self.balance[:, :-1] > self.pmi_target[:, None]
+        months = (self.loan_amounts > self.pmi_target).astype(np.int64) + over_target.sum(axis=1)
+        return np.where(self.pmi_payments > 0, months, 0)
+
+    def loan_analysis_columns(self, horizons=(5, 10, 15)):
+        """The same columns as loan_analysis_columns, summed from the stored months."""
+        columns = {}
+        pmi_months = self.pmi_months()
+        for year in horizons:
+            months = min(year * 12, self.months)
+            loan_paid = (self.interest[:, :months].sum(axis=1) + self.principal[:, :months].sum(axis=1)
+                         + self.extra[:, :months].sum(axis=1))
+            total_pmt = loan_paid + self.pmi[:, :months].sum(axis=1)
+
+            columns[f"Total Payment in {year} Years (includes PMI if applicable) $"] = np.round(total_pmt).astype(np.int64)
+            columns[f"Total Interest in {year} Years $"] = np.round(self.interest[:, :months].sum(axis=1)).astype(np.int64)
+            columns[f"Remaining Balance end of Year {year} $"] = np.round(self.balance[:, months - 1]).astype(np.int64)
+
+        total_pmi = self.pmi.sum(axis=1)
+        total_interest = self.interest.sum(axis=1)
+        total_payment = total_interest + self.principal.sum(axis=1) + self.extra.sum(axis=1) + total_pmi
+        columns["Total Payment (includes PMI if applicable) $"] = np.round(total_payment).astype(np.int64)
+        columns["Total Interest $"] = np.round(total_interest).astype(np.int64)
+        columns["PMI Months"] = pmi_months
+        columns["Total PMI Paid $"] = np.round(total_pmi).astype(np.int64)
+        return columns
+
+    def yearly(self, rows=slice(None)):
+        """Yearly rollups in amortization_cube's layout: "principal" (incl. extra), "interest" and "balance"."""
+        def by_year(values):
+            return values.reshape(values.shape[0], self.loan_term, 12)
+
+        return {
+            "principal": by_year(self.principal[rows] + self.extra[rows]).sum(axis=2),
+            "interest": by_year(self.interest[rows]).sum(axis=2),
+            "balance": by_year(self.balance[rows])[:, :, -1],
+        }
+
+    def monthly_frame(self, df, rows=slice(None)):
+        """Long-format (scenario, month) audit rows; `df` holds the scenarios for `rows`, in store order."""
+        n = len(df)
+        interest, principal, extra = self.interest[rows], self.principal[rows], self.extra[rows]
+        pmi, escrow = self.pmi[rows], self.escrow[rows]
+        return pd.DataFrame({
+            "Loan ID": np.repeat(df.index.to_numpy(), self.months),
+            "Month": np.tile(np.arange(1, self.months + 1), n),
+            "Year": np.tile(np.arange(self.months) // 12 + 1, n),
+            "Starting Balance $": self.opening_balance(rows).ravel(),
+            "Interest $": interest.ravel(),
+            "Principal $": principal.ravel(),
+            "Extra Principal $": extra.ravel(),
+            "PMI $": pmi.ravel(),
+            "Escrow $": escrow.ravel(),
+            "Total Payment $": (interest + principal + extra + pmi + escrow).ravel(),
+            "Remaining Balance $": self.balance[rows].ravel(),
+        })
+
+
+def schedule_for_frame(df, loan_term, **options):
+    """MonthlySchedule for the scenario rows of a filter_scenarios-style DataFrame."""
+    return MonthlySchedule(
+        df["Loan Amount $"].to_numpy(dtype=float),
+        df["Interest Rate %"].to_numpy(dtype=float) / 100,
+        df["Home Price $"].to_numpy(dtype=float),
+        df["PMI $"].to_numpy(dtype=float),
+        loan_term,
+        **options,
+    )
+
+
+# --- Borrower Profiles ---
+# Profile fields use the same units as the app's sidebar: percentages as 6, not 0.06.
+PROFILE_DEFAULTS = {
+    "hoa": 0.0,
+    "property_tax_pct": 0.0,
+    "insurance_pct": 0.0,
+    "pmi_pct": 0.0,
+    "loan_term": 30,
+    "monthly_liability": 0.0,
+    "min_down_pct": 5.0,
+    "max_down_pct": None,
+    "max_monthly_expense": None,
+    "max_discount_points": 7,
+    "down_payment_step_pct": 0.5,
+}
+REQUIRED_PROFILE_FIELDS = ("home_price", "interest_rate_pct", "max_dti_pct", "annual_income", "cash_available")
+
+
+def _profile_value(profile, key):
+    value = profile.get(key, PROFILE_DEFAULTS.get(key))
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return PROFILE_DEFAULTS.get(key)
+    return value
+
+
+def profile_scenarios(profile, solver=True):
+    """Feasible scenario DataFrame (1-based index) for one borrower profile mapping.
+
+    Returns None when a required field is missing or not positive, mirroring
+    the app's required-field check, or when the point count, down-payment step
+    or loan term is out of range.
+    """
+    values = {key: _profile_value(profile, key) for key in REQUIRED_PROFILE_FIELDS + tuple(PROFILE_DEFAULTS)}
+    if not all(values[key] is not None and values[key] > 0 for key in REQUIRED_PROFILE_FIELDS):
+        return None
+    if values["max_discount_points"] < 0 or values["down_payment_step_pct"] <= 0 or values["loan_term"] < 1:
+        return None
+
+    home_price = float(values["home_price"])
+    grid_args = (
+        home_price, values["interest_rate_pct"] / 100, int(values["loan_term"]), int(values["max_discount_points"]),
+        (values["min_down_pct"] or 0) / 100, (values["max_down_pct"] or 100) / 100,
+        (values["property_tax_pct"] or 0) / 100, (values["insurance_pct"] or 0) / 100,
+        (values["pmi_pct"] or 0) / 100, values["hoa"],
+    )
+    constraints = (
+        values["cash_available"], values["monthly_liability"], values["annual_income"] / 12,
+        values["max_dti_pct"] / 100, values["max_monthly_expense"],
+    )
+    dp_step = values["down_payment_step_pct"] / 100
+    if solver:
+        grid = solve_scenario_grid(*grid_args, *constraints, dp_step=dp_step)
+    else:
+        grid = build_scenario_grid(*grid_args, dp_step=dp_step)
+    df = filter_scenarios(grid, *constraints)
+    df.index += 1
+    return df
+
+
+# --- Export ---
+def iter_frame_chunks(df, chunk_rows=50_000):
+    """Yield consecutive row slices of a DataFrame (views, not copies)."""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def iter_amortization_chunks(df, loan_term, chunk_scenarios=2_000, dtype=np.float64):
+    """Long-format amortization rows for df's scenarios, built from the cube a block of scenarios at a time.
+
+    The full (scenarios x years) table never exists in memory at once.
+    """
+    for subset in iter_frame_chunks(df, chunk_scenarios):
+        cube = amortization_cube(
+            subset["Loan Amount $"].to_numpy(),
+            subset["Interest Rate %"].to_numpy() / 100,
+            loan_term,
+            dtype=dtype,
+        )
+        yield amortization_frame(subset, cube)
+
+
+def iter_monthly_chunks(df, loan_term, chunk_scenarios=200, **options):
+    """Monthly audit rows for df's scenarios, from a MonthlySchedule built for one block of scenarios at a time."""
+    for subset in iter_frame_chunks(df, chunk_scenarios):
+        yield schedule_for_frame(subset, loan_term, **options).monthly_frame(subset)
+
+
+def iter_schedule_chunks(df, schedule, monthly=False, chunk_scenarios=200):
+    """Yearly (amortization_frame) or monthly audit rows for df's scenarios, read from a MonthlySchedule in blocks."""
+    for start in range(0, len(df), chunk_scenarios):
+        rows = slice(start, start + chunk_scenarios)
+        subset = df.iloc[rows]
+        if monthly:
+            yield schedule.monthly_frame(subset, rows)
+        else:
+            yield amortization_frame(subset, schedule.yearly(rows))
+
+
+class ChunkWriter:
+    """Write DataFrame chunks to a CSV or Parquet file (path or binary file object) as they arrive.
+
+    Parquet needs pyarrow and is written zstd-compressed by default.
+    """
+
+    def __init__(self, target, file_format=None, compression="zstd"):
+        if file_format is None:
+            file_format = "parquet" if str(target).lower().endswith((".parquet", ".pq")) else "csv"
+        self.file_format = file_format
+        self.compression = compression
+        self._owns_handle = isinstance(target, (str, bytes)) or hasattr(target, "__fspath__")
+        self._handle = open(target, "wb") if self._owns_handle else target
+        self._parquet_writer = None
+        self.rows = 0
+
+    def write(self, df):
+        if df is None or df.empty:
+            return
+        if self.file_format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self._handle, table.schema, compression=self.compression)
+            self._parquet_writer.write_table(table.cast(self._parquet_writer.schema))
+        else:
+            df.to_csv(self._handle, header=self.rows == 0, index=False, mode="wb", encoding="utf-8")
+        self.rows += len(df)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._owns_handle:
+            self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_chunks(chunks, target, file_format=None):
+    """Stream DataFrame chunks into one CSV or Parquet file; returns the number of rows written."""
+    with ChunkWriter(target, file_format) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    return writer.rows
+
+
+# --- Result Cache ---
+def _approx_nbytes(value):
+    """Rough in-memory size of a cached value (DataFrames, arrays, bytes and containers of them)."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_approx_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_approx_nbytes(v) for v in value)
+    return 64
+
+
+class ResultCache:
+    """Thread-safe LRU cache bounded by both entry count and approximate memory.
+
+    Cached values are shared between sessions and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=256 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        size = _approx_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(evicted)
+
+    def get_or_compute(self, key, compute):
+        # Computation runs outside the lock; concurrent misses may compute twice.
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+
+def normalize_cache_key(*params):
+    """Turn raw inputs into a hashable key so equivalent quotes hit the same cache entry."""
+    return tuple(
+        None if p is None else round(float(p), 9) if isinstance(p, (int, float, np.number)) else p
+        for p in params
+    )
@@ -0,0 +1,189 @@
+"""Monte Carlo stress tests for mortgage scenarios: rate paths, ARM resets, refinancing,
+extra principal and early sale.
+
+Balances for a block of paths × a chunk of scenarios evolve together as NumPy
+arrays, one month per step. Only each path's final totals are kept, and
+percentile bands are taken per scenario chunk, so full path histories never
+exist in memory. Random draws are made per block of paths from a seeded
+SeedSequence and shared by every scenario (common random numbers), so results
+are reproducible and don't depend on the memory limit.
+"""
+import numpy as np
+import pandas as pd
+
+from mortgage_engine import calculate_monthly_payment
+
+SIMULATION_METRICS = ["Total Interest $", "PMI Months", "Remaining Balance $"]
+# Per-path float64 state arrays live while a block is simulated (used for chunk sizing)
+_STATE_ARRAYS = 12
+
+
+def _path_block_draws(seed, block, paths, months, rate_volatility, annual_sale_rate):
+    """Market rate deviations, refinance uniforms and sale months for one block of paths."""
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+    shocks = rng.standard_normal((paths, months)) * (rate_volatility / np.sqrt(12))
+    rate_shift = np.cumsum(shocks, axis=1)
+    refi_draws = rng.random((paths, months))
+    if annual_sale_rate > 0:
+        monthly_sale = 1 - (1 - annual_sale_rate) ** (1 / 12)
+        # 0-based month in which the home is sold (geometric waiting time)
+        sale_month = rng.geometric(monthly_sale, paths) - 1
+    else:
+        sale_month = np.full(paths, np.iinfo(np.int64).max)
+    return rate_shift, refi_draws, sale_month
+
+
+def _simulate_block(loan_amounts, interest_rates, home_prices, pmi_payments, term_months, horizon,
+                    rate_shift, refi_draws, sale_month, arm_fixed_years, arm_reset_months,
+                    arm_periodic_cap, arm_lifetime_cap, refi_threshold, refi_probability,
+                    refi_cost_pct, extra_principal, pmi_ltv, rate_floor):
+    """Run one block of paths (rows) for a chunk of scenarios (columns).
+
+    Returns the SIMULATION_METRICS arrays followed by a refinanced-at-least-once mask.
+    """
+    shape = (rate_shift.shape[0], len(loan_amounts))
+    rate0 = np.broadcast_to(interest_rates, shape)
+    balance = np.array(np.broadcast_to(loan_amounts, shape), dtype=float)
+    rate = rate0.copy()
+    payment = np.broadcast_to(calculate_monthly_payment(loan_amounts, interest_rates, term_months / 12), shape).copy()
+    pmi_target = np.broadcast_to(home_prices * pmi_ltv, shape)
+    pmi_on = (balance > pmi_target) & (np.broadcast_to(pmi_payments, shape) > 0)
+    adjustable = np.full(shape, arm_fixed_years is not None)
+    last_refi = np.full(shape, -np.inf)
+    total_interest = np.zeros(shape)
+    pmi_months = np.zeros(shape)
+    arm_start = (arm_fixed_years or 0) * 12
+
+    for month in range(horizon):
+        remaining_months = term_months - month
+        # Offers track the market, keeping each scenario's original spread (points stay bought down)
+        offer = np.maximum(rate0 + rate_shift[:, month, None], rate_floor)
+
+        if arm_fixed_years is not None and month >= arm_start and (month - arm_start) % arm_reset_months == 0:
+            target = np.clip(offer, rate0 - arm_lifetime_cap, rate0 + arm_lifetime_cap)
+            reset = adjustable & (balance > 0)
+            new_rate = np.clip(target, rate - arm_periodic_cap, rate + arm_periodic_cap)
+            rate = np.where(reset, new_rate, rate)
+            payment = np.where(reset, calculate_monthly_payment(balance, rate, remaining_months / 12), payment)
+
+        if refi_probability > 0:
+            refinance = (
+                (balance > 0)
+                & (rate - offer >= refi_threshold)
+                & (month - last_refi >= 12)
+                & (refi_draws[:, month, None] < refi_probability)
+            )
+            if refinance.any():
+                # Closing costs are rolled into the new loan, which is fixed for the remaining term
+                balance = np.where(refinance, balance * (1 + refi_cost_pct), balance)
+                rate = np.where(refinance, offer, rate)
+                payment = np.where(refinance, calculate_monthly_payment(balance, rate, remaining_months / 12), payment)
+                adjustable &= ~refinance
+                last_refi = np.where(refinance, month, last_refi)
+
+        pmi_months += pmi_on & (balance > 0)
+        interest = balance * rate / 12
+        principal = np.clip(payment - interest + extra_principal, 0, balance)
+        total_interest += interest
+        balance -= principal
+        balance[balance < 0.005] = 0.0
+        pmi_on &= balance > pmi_target
+
+        sold = sale_month == month
+        if sold.any():
+            balance[sold] = 0.0
+
+    return total_interest, pmi_months, balance, np.isfinite(last_refi)
+
+
+def simulate_scenarios(loan_amounts, interest_rates, home_prices, pmi_payments, loan_term, n_paths=1000,
+                       seed=0, horizon_years=None, rate_volatility=0.01, rate_floor=0.0,
+                       arm_fixed_years=None, arm_reset_months=12, arm_periodic_cap=0.02, arm_lifetime_cap=0.05,
+                       refi_threshold=0.01, refi_probability=0.0, refi_cost_pct=0.02, extra_principal=0.0,
+                       annual_sale_rate=0.0, pmi_ltv=0.80, percentiles=(5, 50, 95),
+                       memory_limit_mb=64, path_block=512):
+    """Percentile bands of SIMULATION_METRICS across simulated paths for every scenario.
+
+    Rates are fractions. The market rate is a driftless random walk with
+    `rate_volatility` annual standard deviation. With `arm_fixed_years` set,
+    loans reset every `arm_reset_months` after the fixed period to the market
+    move, within periodic and lifetime caps. In-the-money borrowers (by at
+    least `refi_threshold`) refinance with `refi_probability` per month into a
+    fixed loan for the remaining term. `extra_principal` is paid every month,
+    and `annual_sale_rate` is the yearly chance of selling (paying the loan
+    off). Totals run over `horizon_years` (default: the loan term); the
+    remaining balance is the one left at the horizon.
+
+    Paths run in blocks of `path_block`, and scenarios are chunked so that
+    block state plus per-path totals stay within `memory_limit_mb`.
+
+    Returns {metric: array (len(percentiles), n_scenarios)} plus
+    "Refinanced %" and "Sold %" (share of paths, per scenario).
+    """
+    loan_amounts = np.asarray(loan_amounts, dtype=float)
+    interest_rates = np.asarray(interest_rates, dtype=float)
+    home_prices = np.asarray(home_prices, dtype=float)
+    pmi_payments = np.asarray(pmi_payments, dtype=float)
+    n_scenarios = len(loan_amounts)
+    term_months = int(loan_term * 12)
+    horizon = min(int((horizon_years or loan_term) * 12), term_months)
+    blocks = range(0, n_paths, path_block)
+
+    bytes_per_scenario = (min(path_block, n_paths) * _STATE_ARRAYS + n_paths * (len(SIMULATION_METRICS) + 2)) * 8
+    scenario_chunk = max(1, int(memory_limit_mb * 2**20 // bytes_per_scenario))
+
+    results = {metric: np.empty((len(percentiles), n_scenarios)) for metric in SIMULATION_METRICS}
+    results["Refinanced %"] = np.empty(n_scenarios)
+    results["Sold %"] = np.empty(n_scenarios)
+    for start in range(0, n_scenarios, scenario_chunk):
+        chunk = slice(start, min(start + scenario_chunk, n_scenarios))
+        width = chunk.stop - chunk.start
+        totals = np.empty((len(SIMULATION_METRICS), n_paths, width))
+        refinanced = np.zeros(width)
+        sold = np.zeros(width)
+        for block, block_start in enumerate(blocks):
+            paths = min(path_block, n_paths - block_start)
+            # Draws depend only on (seed, block), so every scenario chunk sees the same paths
+            rate_shift, refi_draws, sale_month = _path_block_draws(
+                seed, block, paths, horizon, rate_volatility, annual_sale_rate
+            )
+            *outputs, block_refinanced = _simulate_block(
+                loan_amounts[chunk], interest_rates[chunk], home_prices[chunk], pmi_payments[chunk],
+                term_months, horizon, rate_shift, refi_draws, sale_month, arm_fixed_years,
+                arm_reset_months, arm_periodic_cap, arm_lifetime_cap, refi_threshold, refi_probability,
+                refi_cost_pct, extra_principal, pmi_ltv, rate_floor,
+            )
+            for i, values in enumerate(outputs):
+                totals[i, block_start:block_start + paths] = values
+            refinanced += block_refinanced.sum(axis=0)
+            sold += (sale_month < horizon).sum()
+        for i, metric in enumerate(SIMULATION_METRICS):
+            results[metric][:, chunk] = np.percentile(totals[i], percentiles, axis=0)
+        results["Refinanced %"][chunk] = refinanced / n_paths * 100
+        results["Sold %"][chunk] = sold / n_paths * 100
+    return results
+
+
+def monte_carlo_table(df, loan_term, percentiles=(5, 50, 95), **options):
+    """Scenario rows (as built by filter_scenarios) with simulated percentile bands appended.
+
+    `options` are passed to simulate_scenarios; columns are named e.g. "Total Interest $ P50".
+    """
+    results = simulate_scenarios(
+        df["Loan Amount $"].to_numpy(dtype=float),
+        df["Interest Rate %"].to_numpy(dtype=float) / 100,
+        df["Home Price $"].to_numpy(dtype=float),
+        df["PMI $"].to_numpy(dtype=float),
+        loan_term,
+        percentiles=percentiles,
+        **options,
+    )
+    columns = {}
+    for metric in SIMULATION_METRICS:
+        for row, pct in enumerate(percentiles):
+            values = results[metric][row]
+            columns[f"{metric} P{pct:g}"] = np.round(values) if metric != "PMI Months" else np.round(values, 1)
+    columns["Refinanced %"] = np.round(results["Refinanced %"], 2)
+    columns["Sold %"] = np.round(results["Sold %"], 2)
+    base = df[["Home Price $", "Down %", "Loan Amount $", "Interest Rate %", "Discount Points"]]
+    return pd.concat([base, pd.DataFrame(columns, index=df.index)], axis=1)
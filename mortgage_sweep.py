@@ -0,0 +1,148 @@
+"""Affordability sweep: the full scenario search over a home price × interest rate grid.
+
+Every (price, rate) cell runs the same down payment / discount point / PMI /
+DTI / cash logic as the app, vectorized over prices with NumPy. Rates are
+split across a process pool; workers write their rows straight into one
+shared-memory result array instead of pickling results back.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from mortgage_engine import build_scenario_grid, scenario_mask
+
+SWEEP_METRICS = [
+    "Feasible Scenarios",
+    "Lowest Monthly $",
+    "Down %",
+    "Discount Points",
+    "Total Cash Used $",
+    "DTI %",
+    "Lowest Total Cash Used $",
+]
+
+
+def sweep_rate(prices, interest_rate_base, loan_term, max_discount_points, min_down_pct, max_down_pct,
+               property_tax_rate, insurance_rate, pmi_rate, hoa, cash_available, monthly_liability,
+               monthly_income, max_dti, max_monthly_expense, dp_step=0.005, max_cells=1_000_000):
+    """SWEEP_METRICS for every price at one base rate, as an array of shape (len(prices), len(SWEEP_METRICS)).
+
+    The best scenario is the feasible one with the lowest total monthly cost;
+    infeasible prices get 0 scenarios and NaN metrics. Prices are processed
+    in blocks of at most `max_cells` scenarios to bound memory.
+    """
+    prices = np.asarray(prices, dtype=float)
+    out = np.full((len(prices), len(SWEEP_METRICS)), np.nan)
+    cells_per_price = (int(max_discount_points) + 1) * len(np.arange(min_down_pct, max_down_pct + dp_step, dp_step))
+    block = max(1, max_cells // max(cells_per_price, 1))
+    for start in range(0, len(prices), block):
+        block_prices = prices[start:start + block]
+        grid = build_scenario_grid(
+            block_prices[:, None, None], interest_rate_base, loan_term, max_discount_points,
+            min_down_pct, max_down_pct, property_tax_rate, insurance_rate, pmi_rate, hoa, dp_step=dp_step,
+        )
+        mask, dti = scenario_mask(grid, cash_available, monthly_liability, monthly_income,
+                                  max_dti, max_monthly_expense)
+        mask = mask.reshape(len(block_prices), -1)
+        monthly = np.where(mask, grid["total_monthly"].reshape(mask.shape), np.inf)
+        best = np.argmin(monthly, axis=1)
+        feasible = mask.any(axis=1)
+        rows = best + np.arange(len(block_prices)) * mask.shape[1]
+
+        metrics = out[start:start + len(block_prices)]
+        metrics[:, 0] = mask.sum(axis=1)
+        metrics[feasible, 1] = np.round(grid["total_monthly"][rows], 2)[feasible]
+        metrics[feasible, 2] = np.round(grid["dp_pct"][rows] * 100, 2)[feasible]
+        metrics[feasible, 3] = grid["points"][rows][feasible]
+        metrics[feasible, 4] = np.round(grid["total_cash"][rows])[feasible]
+        metrics[feasible, 5] = np.round(dti[rows] * 100, 2)[feasible]
+        cash = np.where(mask, grid["total_cash"].reshape(mask.shape), np.inf).min(axis=1)
+        metrics[feasible, 6] = np.round(cash)[feasible]
+    return out
+
+
+def _sweep_worker(shm_name, shape, rate_indices, prices, rates, params):
+    """Fill rows `rate_indices` of the shared result array; runs inside a worker process."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        surface = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        for i in rate_indices:
+            surface[i] = sweep_rate(prices, rates[i], **params)
+        del surface
+    finally:
+        shm.close()
+
+
+def affordability_sweep(prices, rates, loan_term, max_discount_points, min_down_pct, max_down_pct,
+                        property_tax_rate, insurance_rate, pmi_rate, hoa, cash_available, monthly_liability,
+                        monthly_income, max_dti, max_monthly_expense, dp_step=0.005, workers=None,
+                        min_parallel_scenarios=2_000_000):
+    """Sweep every (rate, price) pair; returns an array of shape (len(rates), len(prices), len(SWEEP_METRICS)).
+
+    Rates and down-payment bounds are fractions, as in build_scenario_grid.
+    With more than one worker, rates are dealt round-robin to a process pool
+    whose workers write into a shared-memory array. Sweeps under
+    `min_parallel_scenarios` total scenarios (or one worker) run in-process,
+    where pool start-up would cost more than it saves.
+    """
+    prices = np.asarray(prices, dtype=float)
+    rates = np.asarray(rates, dtype=float)
+    params = dict(
+        loan_term=loan_term, max_discount_points=max_discount_points, min_down_pct=min_down_pct,
+        max_down_pct=max_down_pct, property_tax_rate=property_tax_rate, insurance_rate=insurance_rate,
+        pmi_rate=pmi_rate, hoa=hoa, cash_available=cash_available, monthly_liability=monthly_liability,
+        monthly_income=monthly_income, max_dti=max_dti, max_monthly_expense=max_monthly_expense, dp_step=dp_step,
+    )
+    shape = (len(rates), len(prices), len(SWEEP_METRICS))
+    workers = min(workers or os.cpu_count() or 1, len(rates))
+    dp_count = len(np.arange(min_down_pct, max_down_pct + dp_step, dp_step))
+    scenarios = len(rates) * len(prices) * (int(max_discount_points) + 1) * dp_count
+    if workers <= 1 or scenarios < min_parallel_scenarios:
+        surface = np.empty(shape)
+        for i, rate in enumerate(rates):
+            surface[i] = sweep_rate(prices, rate, **params)
+        return surface
+
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+    try:
+        # Forked workers would inherit the calling (e.g. Streamlit) server's threads and open sockets
+        context = multiprocessing.get_context("forkserver")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            # Round-robin keeps each worker's share of cheap and expensive rates even
+            futures = [
+                pool.submit(_sweep_worker, shm.name, shape, range(worker, len(rates), workers), prices, rates, params)
+                for worker in range(workers)
+            ]
+            for future in futures:
+                future.result()
+        return np.ndarray(shape, dtype=np.float64, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def sweep_frame(surface, prices, rates):
+    """Long-format DataFrame with one row per (rate, price) cell."""
+    rate_grid, price_grid = np.meshgrid(np.asarray(rates, dtype=float), np.asarray(prices, dtype=float), indexing="ij")
+    df = pd.DataFrame(surface.reshape(-1, len(SWEEP_METRICS)), columns=SWEEP_METRICS)
+    df.insert(0, "Interest Rate %", np.round(rate_grid.ravel() * 100, 3))
+    df.insert(1, "Home Price $", np.round(price_grid.ravel()).astype(np.int64))
+    df["Feasible Scenarios"] = df["Feasible Scenarios"].astype(np.int64)
+    return df
+
+
+def max_affordable_by_rate(sweep_df):
+    """Highest swept price with at least one feasible scenario at each rate, with that price's best scenario.
+
+    Takes the sweep_frame output; rates where no price is affordable keep a row of NaNs.
+    """
+    feasible = sweep_df[sweep_df["Feasible Scenarios"] > 0]
+    best = feasible.loc[feasible.groupby("Interest Rate %")["Home Price $"].idxmax()]
+    rates = pd.Index(sweep_df["Interest Rate %"].unique(), name="Interest Rate %")
+    df = best.set_index("Interest Rate %").reindex(rates).reset_index()
+    df["Feasible Scenarios"] = df["Feasible Scenarios"].fillna(0).astype(np.int64)
+    return df.rename(columns={"Home Price $": "Max Affordable Price $"})
@@ -0,0 +1,388 @@
+"""Local HTTP/JSON quote service around the mortgage scenario engine.
+
+    python quote_service.py --port 8765 --workers 4
+
+POST /quote with one borrower profile (fields and units as in
+mortgage_engine.PROFILE_DEFAULTS / REQUIRED_PROFILE_FIELDS, e.g.
+{"home_price": 300000, "interest_rate_pct": 6, ...}) or a JSON list of them.
+Optional request fields: "top" (cheapest scenarios to return, default 5),
+"loan_analysis" (add the Loan Analysis columns, default true),
+"pmi_cancel_ltv_pct" (80 or 78) and "profile_id" (echoed in the response).
+Unknown fields are rejected. GET /health returns service counters.
+
+Requests are handled with asyncio. Concurrent quotes are coalesced into
+micro-batches (up to --max-batch, waiting at most --max-wait-ms) that a
+worker pool prices together, with one vectorized loan-analysis pass per
+batch. Responses for identical parameter sets are served from a ResultCache,
+and identical requests already in flight share one computation.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+from mortgage_engine import (
+    PROFILE_DEFAULTS,
+    REQUIRED_PROFILE_FIELDS,
+    ResultCache,
+    loan_analysis_columns,
+    normalize_cache_key,
+    profile_scenarios,
+)
+
+QUOTE_OPTIONS = {"top": 5, "loan_analysis": True, "pmi_cancel_ltv_pct": 80.0}
+PROFILE_FIELDS = REQUIRED_PROFILE_FIELDS + tuple(PROFILE_DEFAULTS)
+# Same bounds as the app's sidebar inputs
+PROFILE_RANGES = {"loan_term": (1, 30), "max_discount_points": (0, 20), "down_payment_step_pct": (0.01, 5.0)}
+MAX_BODY_BYTES = 1 * 2**20
+
+
+# --- Pricing (runs in worker processes) ---
+def _records(df):
+    """JSON-ready row dicts (NumPy scalars and NaN converted)."""
+    return json.loads(df.to_json(orient="records"))
+
+
+def quote_batch(requests):
+    """Price a micro-batch of quote requests; returns one response dict per request.
+
+    Each profile's scenario grid is solved on its own (already vectorized per
+    profile), so a profile that fails only fails its own request; the Loan
+    Analysis columns for every returned scenario in the batch are then
+    computed in a single vectorized call.
+    """
+    tops, errors = [], []
+    for request in requests:
+        try:
+            df = profile_scenarios(request["profile"])
+        except Exception as exc:
+            errors.append(f"Pricing failed: {exc}")
+            tops.append(None)
+            continue
+        if df is None:
+            missing = [
+                key for key in REQUIRED_PROFILE_FIELDS
+                if not isinstance(request["profile"].get(key), (int, float)) or request["profile"][key] <= 0
+            ]
+            errors.append("Missing or non-positive required field(s): " + ", ".join(missing) if missing
+                          else "Out-of-range loan_term, max_discount_points or down_payment_step_pct")
+            tops.append(None)
+            continue
+        errors.append(None)
+        tops.append((len(df), df.nsmallest(int(request["top"]), "Total Monthly $", keep="first")))
+
+    analysed = [i for i, top in enumerate(tops) if top is not None and requests[i]["loan_analysis"] and len(top[1])]
+    if analysed:
+        rows = pd.concat([tops[i][1] for i in analysed])
+        ltv = np.concatenate([np.full(len(tops[i][1]), requests[i]["pmi_cancel_ltv_pct"] / 100) for i in analysed])
+        # Same 30-year horizon convention as the app's Loan Analysis tab
+        columns = loan_analysis_columns(
+            rows["Loan Amount $"].to_numpy(dtype=float),
+            rows["Home Price $"].to_numpy(dtype=float),
+            rows["Interest Rate %"].to_numpy(dtype=float) / 100,
+            rows["PMI $"].to_numpy(dtype=float),
+            pmi_ltv=ltv,
+        )
+        rows = rows.assign(**columns)
+        offset = 0
+        for i in analysed:
+            count, top = tops[i]
+            tops[i] = (count, rows.iloc[offset:offset + len(top)])
+            offset += len(top)
+
+    responses = []
+    for top, error in zip(tops, errors):
+        if error:
+            responses.append({"error": error})
+            continue
+        count, df = top
+        scenarios = df.reset_index(names="Scenario")
+        responses.append({"feasible_scenarios": count, "scenarios": _records(scenarios)})
+    return responses
+
+
+# --- Batching ---
+def _is_number(value):
+    # bool is an int subclass, but true/false is never a valid amount
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def normalize_request(payload):
+    """Split a request body into (cache key, request dict); raises ValueError on bad input.
+
+    "profile_id" is left out of both, since it doesn't change the quote.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Each quote must be a JSON object")
+    unknown = sorted(set(payload) - set(PROFILE_FIELDS) - set(QUOTE_OPTIONS) - {"profile_id"})
+    if unknown:
+        raise ValueError("Unknown field(s): " + ", ".join(unknown))
+    options = {key: payload.get(key, default) for key, default in QUOTE_OPTIONS.items()}
+    if not isinstance(options["top"], int) or isinstance(options["top"], bool) or not 1 <= options["top"] <= 1000:
+        raise ValueError('"top" must be an integer between 1 and 1000')
+    if not isinstance(options["loan_analysis"], bool):
+        raise ValueError('"loan_analysis" must be true or false')
+    if not _is_number(options["pmi_cancel_ltv_pct"]) or options["pmi_cancel_ltv_pct"] not in (78, 80):
+        raise ValueError('"pmi_cancel_ltv_pct" must be 78 or 80')
+    profile_id = payload.get("profile_id")
+    if profile_id is not None and not (isinstance(profile_id, str) or _is_number(profile_id)):
+        raise ValueError('"profile_id" must be a string or a number')
+    profile = {key: value for key, value in payload.items() if key in PROFILE_FIELDS}
+    for key, value in profile.items():
+        if value is not None and not _is_number(value):
+            raise ValueError(f'"{key}" must be a number')
+    for key, (low, high) in PROFILE_RANGES.items():
+        if profile.get(key) is not None and not low <= profile[key] <= high:
+            raise ValueError(f'"{key}" must be between {low:g} and {high:g}')
+    key = normalize_cache_key(*(part for item in sorted(profile.items()) + sorted(options.items()) for part in item))
+    return key, {"profile": profile, **options}
+
+
+class QuoteService:
+    """Coalesces concurrent quote requests into micro-batches priced on a process pool."""
+
+    def __init__(self, workers=None, max_batch=64, max_wait_ms=5.0, cache_entries=10_000):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cache = ResultCache(max_entries=cache_entries, max_bytes=256 * 2**20)
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "batches": 0, "batched_quotes": 0,
+                      "pool_restarts": 0}
+        self.last_pool_error = None
+        self._pool_failing = False
+        self._in_flight = {}
+        self._queue = None
+        self._pool = None
+        self._slots = None
+        self._batcher = None
+        self._batch_tasks = set()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._pool = self._new_pool()
+        # Keep every worker busy with one batch queued behind it
+        self._slots = asyncio.Semaphore(self.workers * 2)
+        self._batcher = asyncio.create_task(self._collect_batches())
+
+    async def stop(self):
+        self._batcher.cancel()
+        self._pool.shutdown(cancel_futures=True)
+
+    def _new_pool(self):
+        # Forked workers would inherit the listening socket and keep the port open if orphaned
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver"))
+
+    def _replace_pool(self, broken, exc):
+        """Swap in a fresh pool for one that lost a worker (once, however many batches saw it break)."""
+        self.last_pool_error = f"{type(exc).__name__}: {exc}"
+        if self._pool is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._new_pool()
+            self.stats["pool_restarts"] += 1
+
+    async def quote(self, payload):
+        """Response dict for one quote payload (cached, shared with an identical in-flight request, or batched)."""
+        self.stats["requests"] += 1
+        key, request = normalize_request(payload)
+        missing = object()
+        response = self.cache.get(key, missing)
+        if response is not missing:
+            self.stats["cache_hits"] += 1
+        elif key in self._in_flight:
+            self.stats["coalesced"] += 1
+            response = await asyncio.shield(self._in_flight[key])
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight[key] = future
+            await self._queue.put((key, request, future))
+            response = await asyncio.shield(future)
+        if payload.get("profile_id") is not None:
+            return {"profile_id": payload["profile_id"], **response}
+        return response
+
+    async def _collect_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch):
+        try:
+            self.stats["batches"] += 1
+            self.stats["batched_quotes"] += len(batch)
+            cacheable = True
+            try:
+                responses = await self._price([request for _, request, _ in batch])
+            except Exception as exc:  # a failed batch fails each of its requests, not the service
+                responses = [{"error": f"Pricing failed: {exc}"}] * len(batch)
+                cacheable = False
+            for (key, _, future), response in zip(batch, responses):
+                if cacheable:
+                    self.cache.put(key, response)
+                self._in_flight.pop(key, None)
+                if not future.done():
+                    future.set_result(response)
+        finally:
+            self._slots.release()
+
+    async def _price(self, requests):
+        """quote_batch on the pool; if a worker died, retries once on a fresh pool."""
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = self._pool
+            try:
+                responses = await loop.run_in_executor(pool, quote_batch, requests)
+            except BrokenProcessPool as exc:
+                self._replace_pool(pool, exc)
+                if attempt:
+                    self._pool_failing = True
+                    raise
+            else:
+                self._pool_failing = False
+                return responses
+
+    def health(self):
+        """Service counters; status is "degraded" while batches keep failing after a pool restart."""
+        batches = self.stats["batches"]
+        return {
+            "status": "degraded" if self._pool_failing else "ok",
+            "workers": self.workers,
+            **self.stats,
+            "mean_batch_size": self.stats["batched_quotes"] / batches if batches else 0.0,
+            "last_pool_error": self.last_pool_error,
+        }
+
+
+# --- HTTP ---
+async def _read_request(reader):
+    """Parse one HTTP/1.1 request; returns (method, path, headers, body) or None at EOF."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise ValueError("Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload).encode()
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+async def _dispatch(service, method, path, body):
+    """Route one request; returns (HTTPStatus, payload)."""
+    if path == "/health":
+        return (HTTPStatus.OK, service.health()) if method == "GET" else (HTTPStatus.METHOD_NOT_ALLOWED, {})
+    if path != "/quote":
+        return HTTPStatus.NOT_FOUND, {"error": f"Unknown path {path}"}
+    if method != "POST":
+        return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use POST"}
+    try:
+        payload = json.loads(body or b"null")
+        if isinstance(payload, list):
+            return HTTPStatus.OK, list(await asyncio.gather(*(service.quote(item) for item in payload)))
+        return HTTPStatus.OK, await service.quote(payload)
+    except ValueError as exc:  # includes json.JSONDecodeError
+        return HTTPStatus.BAD_REQUEST, {"error": str(exc)}
+
+
+async def handle_connection(service, reader, writer):
+    """Serve requests on one keep-alive connection until the client closes it."""
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except (ValueError, asyncio.IncompleteReadError) as exc:
+                writer.write(_response(HTTPStatus.BAD_REQUEST, {"error": str(exc) or "Bad request"}, False))
+                break
+            if request is None:
+                break
+            method, path, headers, body = request
+            keep_alive = headers.get("connection", "").lower() != "close"
+            status, payload = await _dispatch(service, method, path, body)
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host="127.0.0.1", port=8765, ready=None, **service_options):
+    """Run the quote service until cancelled or sent SIGTERM; `ready` (an asyncio.Event) is set once it is listening."""
+    service = QuoteService(**service_options)
+    await service.start()
+    try:
+        server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+        print(f"Quote service listening on http://{host}:{port} ({service.workers} workers)", flush=True)
+        if ready is not None:
+            ready.set()
+        terminated = asyncio.Event()
+        with contextlib.suppress(NotImplementedError):  # no signal handlers on Windows event loops
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, terminated.set)
+        async with server:
+            await terminated.wait()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve mortgage scenario quotes over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--max-batch", type=int, default=64, help="Most quotes priced per batch (default: 64)")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="Longest a quote waits for its batch to fill (default: 5)")
+    parser.add_argument("--cache-entries", type=int, default=10_000, help="Cached responses kept (default: 10000)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, max_batch=args.max_batch,
+                          max_wait_ms=args.max_wait_ms, cache_entries=args.cache_entries))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""Batch pricing CLI: malformed rows are reported per profile instead of failing the run."""
+import pandas as pd
+import pytest
+
+from mortgage_batch import run_batch
+
+PROFILE = {"home_price": 300000, "interest_rate_pct": 6, "max_dti_pct": 43, "annual_income": 120000,
+           "cash_available": 80000}
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_malformed_rows_are_reported_per_profile(tmp_path, file_format):
+    rows = [dict(PROFILE, profile_id=f"p{i}") for i in range(6)]
+    rows[2]["max_discount_points"] = -1
+    rows[4]["down_payment_step_pct"] = 0
+    source = tmp_path / "profiles.csv"
+    pd.DataFrame(rows).to_csv(source, index=False)
+    target = tmp_path / f"summary.{file_format}"
+
+    profiles, errors, _ = run_batch(source, target, chunksize=2, workers=1)
+    assert profiles == 6
+    assert [profile_id for profile_id, _ in errors] == ["p2", "p4"]
+    summary = pd.read_csv(target) if file_format == "csv" else pd.read_parquet(target)
+    assert summary["Profile ID"].tolist() == [f"p{i}" for i in range(6)]
+    failed = summary["Profile ID"].isin(["p2", "p4"])
+    assert summary.loc[failed, "Error"].notna().all()
+    assert summary.loc[failed, "Feasible Scenarios"].eq(0).all()
+    assert summary.loc[~failed, "Error"].isna().all()
+    assert summary.loc[~failed, "Feasible Scenarios"].gt(0).all()
+
+
+def test_unparseable_value_does_not_fail_the_chunk(tmp_path):
+    source = tmp_path / "profiles.csv"
+    pd.DataFrame([dict(PROFILE, hoa="unknown"), PROFILE]).to_csv(source, index=False)
+
+    profiles, errors, _ = run_batch(source, tmp_path / "summary.csv", chunksize=2, workers=1, detail=True)
+    assert profiles == 2
+    assert [profile_id for profile_id, _ in errors] == [1]
+    assert set(pd.read_csv(tmp_path / "summary.csv")["Profile ID"]) == {2}
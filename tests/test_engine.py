@@ -0,0 +1,406 @@
+"""Check the vectorized engine against the original app's scalar loops."""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mortgage_engine import (
+    MonthlySchedule,
+    ResultCache,
+    amortization_cube,
+    build_scenario_grid,
+    calculate_monthly_payment,
+    export_chunks,
+    filter_scenarios,
+    iter_amortization_chunks,
+    iter_frame_chunks,
+    iter_monthly_chunks,
+    iter_schedule_chunks,
+    loan_analysis_columns,
+    loan_details_table,
+    months_until_ltv_80,
+    pareto_frontier_mask,
+    profile_scenarios,
+    schedule_for_frame,
+    solve_scenario_grid,
+)
+
+
+# --- Reference loops (as in the original mortgage_calculator_app.py) ---
+def loop_monthly_payment(loan_amount, interest_rate, years):
+    r = interest_rate / 12
+    n = years * 12
+    if r == 0:
+        return loan_amount / n
+    return loan_amount * r * (1 + r) ** n / ((1 + r) ** n - 1)
+
+
+def loop_months_until_ltv_80(home_price, loan_amount, interest_rate, loan_term, ltv=0.80):
+    monthly_payment = loop_monthly_payment(loan_amount, interest_rate, loan_term)
+    balance = loan_amount
+    r = interest_rate / 12
+    target_balance = home_price * ltv
+    months = 0
+    while balance > target_balance and months < loan_term * 12:
+        interest = balance * r
+        principal = monthly_payment - interest
+        balance -= principal
+        months += 1
+    return months
+
+
+def loop_interest_paid(loan, r, pmt, months):
+    balance = loan
+    interest = 0
+    for _ in range(months):
+        int_paid = balance * r
+        principal = pmt - int_paid
+        balance -= principal
+        interest += int_paid
+    return interest, balance
+
+
+def loop_amortization_schedule(loan_amount, interest_rate, loan_term):
+    monthly_payment = loop_monthly_payment(loan_amount, interest_rate, loan_term)
+    balance = loan_amount
+    r = interest_rate / 12
+    rows = []
+    for _ in range(loan_term):
+        total_principal_paid = 0
+        total_interest_paid = 0
+        for _ in range(12):
+            interest_payment = balance * r
+            principal_payment = monthly_payment - interest_payment
+            balance -= principal_payment
+            total_interest_paid += interest_payment
+            total_principal_paid += principal_payment
+        rows.append((total_principal_paid, total_interest_paid, balance))
+    return np.array(rows)
+
+
+def loop_scenarios(home_price, interest_rate_base, loan_term, max_discount_points, min_down_pct,
+                   max_down_pct, property_tax_rate, insurance_rate, pmi_rate, hoa, cash_available,
+                   monthly_liability, monthly_income, max_dti, max_monthly_expense):
+    results = []
+    for points in range(0, int(max_discount_points) + 1):
+        adjusted_rate = interest_rate_base - points * 0.0025
+        for dp_pct in np.arange(min_down_pct, max_down_pct + 0.005, 0.005):
+            down_payment = home_price * dp_pct
+            loan_amt = home_price - down_payment
+            closing_cost = loan_amt * (points * 0.01)
+            total_cash = down_payment + closing_cost
+            if cash_available is not None and total_cash > cash_available:
+                continue
+            principal_interest = loop_monthly_payment(loan_amt, adjusted_rate, loan_term)
+            property_tax = (home_price * property_tax_rate) / 12
+            insurance = home_price * insurance_rate / 12
+            pmi = (loan_amt * pmi_rate / 12) if dp_pct < 0.20 else 0
+            total_monthly = principal_interest + (hoa or 0) + property_tax + insurance + pmi
+            dti = (total_monthly + (monthly_liability or 0)) / monthly_income
+            if (max_monthly_expense is None or total_monthly <= max_monthly_expense) and dti <= max_dti:
+                results.append({
+                    "Home Price $": round(home_price),
+                    "Down %": round(dp_pct * 100, 2),
+                    "Down $": round(down_payment),
+                    "Loan Amount $": round(loan_amt),
+                    "Interest Rate %": round(adjusted_rate * 100, 3),
+                    "Discount Points": points,
+                    "Closing Cost $": round(closing_cost),
+                    "PMI $": round(pmi, 2),
+                    "Total Cash Used $": round(total_cash),
+                    "Monthly P&I $": round(principal_interest, 2),
+                    "Total Monthly $": round(total_monthly, 2),
+                    "DTI %": round(dti * 100, 2),
+                })
+    return pd.DataFrame(results)
+
+
+def random_inputs(rng):
+    income = float(rng.integers(40, 500)) * 1000
+    home_price = float(round(income * rng.uniform(1.5, 4.5), -3))
+    return dict(
+        home_price=home_price,
+        interest_rate_base=float(rng.uniform(0.03, 0.09)),
+        loan_term=int(rng.choice([10, 15, 20, 30])),
+        max_discount_points=int(rng.integers(0, 10)),
+        min_down_pct=float(rng.choice([0.0, 0.03, 0.05, 0.10])),
+        max_down_pct=float(rng.choice([0.20, 0.35, 0.50, 1.0])),
+        property_tax_rate=float(rng.uniform(0, 0.025)),
+        insurance_rate=float(rng.uniform(0, 0.01)),
+        pmi_rate=float(rng.uniform(0, 0.015)),
+        hoa=float(rng.integers(0, 600)),
+        cash_available=None if rng.random() < 0.1 else home_price * float(rng.uniform(0.05, 0.6)),
+        monthly_liability=float(rng.integers(0, 1000)),
+        monthly_income=income / 12,
+        max_dti=float(rng.uniform(0.25, 0.5)),
+        max_monthly_expense=None if rng.random() < 0.5 else income / 12 * float(rng.uniform(0.2, 0.5)),
+    )
+
+
+GRID_KEYS = ("home_price", "interest_rate_base", "loan_term", "max_discount_points", "min_down_pct",
+             "max_down_pct", "property_tax_rate", "insurance_rate", "pmi_rate", "hoa")
+CONSTRAINT_KEYS = ("cash_available", "monthly_liability", "monthly_income", "max_dti", "max_monthly_expense")
+
+
+def assert_same_scenarios(df, expected):
+    assert len(df) == len(expected)
+    if len(expected):
+        df = df.reset_index(drop=True)
+        for column in expected.columns:
+            np.testing.assert_allclose(df[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float),
+                                       rtol=0, atol=0.011, err_msg=column)
+
+
+def random_loans(rng, n):
+    prices = rng.uniform(100_000, 1_500_000, n)
+    loans = prices * rng.uniform(0.5, 1.0, n)
+    rates = rng.uniform(0.01, 0.12, n)
+    return prices, loans, rates
+
+
+# --- Scenario grid ---
+@pytest.mark.parametrize("case", range(150))
+def test_scenario_grid_matches_loop(case):
+    inputs = random_inputs(np.random.default_rng(case))
+    expected = loop_scenarios(**inputs)
+    grid_args = [inputs[key] for key in GRID_KEYS]
+    constraints = [inputs[key] for key in CONSTRAINT_KEYS]
+
+    full = filter_scenarios(build_scenario_grid(*grid_args), *constraints)
+    assert_same_scenarios(full, expected)
+    solved = filter_scenarios(solve_scenario_grid(*grid_args, *constraints), *constraints)
+    assert_same_scenarios(solved, expected)
+
+
+def test_monthly_payment_matches_loop():
+    rng = np.random.default_rng(0)
+    loans = rng.uniform(10_000, 2_000_000, 500)
+    rates = np.append(rng.uniform(0.001, 0.12, 499), 0.0)
+    expected = [loop_monthly_payment(loan, rate, 30) for loan, rate in zip(loans, rates)]
+    np.testing.assert_allclose(calculate_monthly_payment(loans, rates, 30), expected, rtol=1e-12)
+
+
+def test_solver_with_no_point_levels_returns_empty_grid():
+    inputs = random_inputs(np.random.default_rng(0))
+    inputs["max_discount_points"] = -1
+    grid = solve_scenario_grid(*[inputs[key] for key in GRID_KEYS + CONSTRAINT_KEYS])
+    assert len(filter_scenarios(grid, *[inputs[key] for key in CONSTRAINT_KEYS])) == 0
+
+
+@pytest.mark.parametrize("field, value", [
+    ("max_discount_points", -1), ("down_payment_step_pct", 0), ("loan_term", 0), ("home_price", -5),
+])
+def test_profile_scenarios_rejects_out_of_range_fields(field, value):
+    profile = {"home_price": 300000, "interest_rate_pct": 6, "max_dti_pct": 43, "annual_income": 120000,
+               "cash_available": 80000}
+    assert len(profile_scenarios(profile)) > 0
+    assert profile_scenarios({**profile, field: value}) is None
+
+
+@pytest.mark.parametrize("case", range(300))
+def test_pareto_frontier_matches_brute_force(case):
+    rng = np.random.default_rng(case)
+    n = int(rng.integers(0, 80))
+    # Small integer ranges force ties and duplicate rows
+    objectives = rng.integers(0, int(rng.integers(2, 20)), (n, 3)).astype(float)
+    expected = [
+        not any(np.all(other <= row) and np.any(other < row) for other in objectives)
+        for row in objectives
+    ]
+    np.testing.assert_array_equal(pareto_frontier_mask(objectives), expected)
+
+
+# --- Loan analysis ---
+def test_loan_details_match_loop():
+    rng = np.random.default_rng(2)
+    inputs = random_inputs(rng)
+    inputs.update(cash_available=None, max_monthly_expense=None, max_dti=10.0)
+    df = loop_scenarios(**inputs)
+    df.index += 1
+    table = loan_details_table(df)
+
+    for i, row in df.iterrows():
+        rate = row["Interest Rate %"] / 100
+        pmt = loop_monthly_payment(row["Loan Amount $"], rate, 30)
+        pmi_months = loop_months_until_ltv_80(row["Home Price $"], row["Loan Amount $"], rate, 30)
+        result = table.loc[i]
+        assert result["PMI Months"] == pmi_months
+        assert result["Loan ID"] == f"Loan {i + 1}"
+        for year in (5, 10, 15):
+            months = year * 12
+            int_paid, rem_bal = loop_interest_paid(row["Loan Amount $"], rate / 12, pmt, months)
+            total_pmt = pmt * months + row["PMI $"] * min(pmi_months, months)
+            assert abs(result[f"Total Payment in {year} Years (includes PMI if applicable) $"] - total_pmt) <= 0.5 + 1e-6
+            assert abs(result[f"Total Interest in {year} Years $"] - int_paid) <= 0.5 + 1e-6
+            assert abs(result[f"Remaining Balance end of Year {year} $"] - rem_bal) <= 0.5 + 1e-6
+        total_int, _ = loop_interest_paid(row["Loan Amount $"], rate / 12, pmt, 360)
+        assert abs(result["Total Interest $"] - total_int) <= 0.5 + 1e-6
+        assert abs(result["Total PMI Paid $"] - row["PMI $"] * pmi_months) <= 0.5 + 1e-6
+
+
+@pytest.mark.parametrize("ltv", [0.80, 0.78])
+def test_pmi_months_match_loop(ltv):
+    rng = np.random.default_rng(1)
+    prices, loans, rates = random_loans(rng, 5000)
+    terms = rng.choice([10, 15, 20, 30], 5000)
+    expected = [loop_months_until_ltv_80(*args, ltv=ltv) for args in zip(prices, loans, rates, terms)]
+    np.testing.assert_array_equal(months_until_ltv_80(prices, loans, rates, terms, ltv=ltv), expected)
+    assert months_until_ltv_80(prices[0], loans[0], rates[0], terms[0], ltv=ltv) == expected[0]
+
+
+def test_no_pmi_months_without_pmi_payment():
+    # 21% down: no PMI is charged, but the balance is still above 78% of the price
+    df = pd.DataFrame({"Home Price $": [300000, 300000], "Loan Amount $": [237000, 270000],
+                       "Interest Rate %": [6.0, 6.0], "PMI $": [0.0, 112.5]})
+    table = loan_details_table(df, pmi_ltv=0.78)
+    assert table["PMI Months"].tolist()[0] == 0
+    assert table["PMI Months"].tolist()[1] > 0
+    schedule = MonthlySchedule(df["Loan Amount $"], df["Interest Rate %"] / 100, df["Home Price $"],
+                               df["PMI $"], 30, pmi_ltv=0.78)
+    assert schedule.pmi_months().tolist() == table["PMI Months"].tolist()
+
+
+# --- Amortization ---
+def test_amortization_cube_matches_loop():
+    rng = np.random.default_rng(3)
+    _, loans, rates = random_loans(rng, 40)
+    for term in (15, 30):
+        cube = amortization_cube(loans, rates, term)
+        for i, (loan, rate) in enumerate(zip(loans, rates)):
+            expected = loop_amortization_schedule(loan, rate, term)
+            np.testing.assert_allclose(cube["principal"][i], expected[:, 0], rtol=1e-9, atol=1e-6)
+            np.testing.assert_allclose(cube["interest"][i], expected[:, 1], rtol=1e-9, atol=1e-6)
+            np.testing.assert_allclose(cube["balance"][i], expected[:, 2], rtol=1e-9, atol=1e-5)
+
+
+def loop_monthly_schedule(loan, rate, home_price, pmi, term, escrow, extra):
+    """Month-by-month (balance, interest, principal, extra, pmi, escrow) rows, paying off early with extra."""
+    payment = loop_monthly_payment(loan, rate, term)
+    balance = loan
+    rows = []
+    for _ in range(term * 12):
+        opening = balance
+        interest = opening * rate / 12
+        principal = min(payment - interest, opening)
+        extra_paid = min(extra, opening - principal)
+        balance = opening - principal - extra_paid
+        if balance < 0.005:
+            extra_paid += balance
+            balance = 0.0
+        rows.append((balance, interest, principal, extra_paid,
+                     pmi if pmi > 0 and opening > home_price * 0.80 else 0.0, escrow if opening > 0 else 0.0))
+    return np.array(rows).T
+
+
+def test_monthly_schedule_matches_closed_form():
+    rng = np.random.default_rng(4)
+    prices, loans, rates = random_loans(rng, 200)
+    pmi = np.where(loans > prices * 0.8, loans * 0.005 / 12, 0.0)
+    schedule = MonthlySchedule(loans, rates, prices, pmi, 30, chunk_scenarios=64)
+    cube = amortization_cube(loans, rates, 30)
+    yearly = schedule.yearly()
+    for key in ("principal", "interest", "balance"):
+        np.testing.assert_allclose(yearly[key], cube[key], rtol=1e-9, atol=1e-5)
+
+    expected = loan_analysis_columns(loans, prices, rates, pmi)
+    columns = schedule.loan_analysis_columns()
+    for name, values in expected.items():
+        np.testing.assert_allclose(columns[name], values, atol=1, err_msg=name)
+
+
+def test_monthly_schedule_matches_loop_with_extra_principal():
+    rng = np.random.default_rng(5)
+    prices, loans, rates = random_loans(rng, 20)
+    pmi = np.where(loans > prices * 0.8, loans * 0.005 / 12, 0.0)
+    schedule = MonthlySchedule(loans, rates, prices, pmi, 30, escrow=450.0, extra_principal=400.0)
+    for i in range(len(loans)):
+        expected = loop_monthly_schedule(loans[i], rates[i], prices[i], pmi[i], 30, 450.0, 400.0)
+        np.testing.assert_allclose(schedule.data[:, i], expected, rtol=1e-7, atol=1e-4)
+
+
+def test_monthly_schedule_memmap_matches_memory(tmp_path):
+    rng = np.random.default_rng(6)
+    prices, loans, rates = random_loans(rng, 50)
+    pmi = loans * 0.005 / 12
+    in_memory = MonthlySchedule(loans, rates, prices, pmi, 20, extra_principal=100.0)
+    on_disk = MonthlySchedule(loans, rates, prices, pmi, 20, extra_principal=100.0, path=tmp_path / "schedule.dat")
+    assert isinstance(on_disk.data, np.memmap)
+    np.testing.assert_array_equal(on_disk.data, in_memory.data)
+    low_memory = MonthlySchedule(loans, rates, prices, pmi, 20, extra_principal=100.0, dtype=np.float32)
+    np.testing.assert_allclose(low_memory.data, in_memory.data, rtol=1e-4, atol=0.05)
+
+
+def test_export_chunks_without_a_store_match_the_store():
+    rng = np.random.default_rng(7)
+    prices, loans, rates = random_loans(rng, 30)
+    df = pd.DataFrame({"Home Price $": prices, "Loan Amount $": loans, "Down $": prices - loans,
+                       "Interest Rate %": rates * 100, "PMI $": np.where(loans > prices * 0.8, loans * 0.005 / 12, 0.0)})
+    df.index += 1
+    options = {"escrow": 450.0, "pmi_ltv": 0.78}
+    schedule = schedule_for_frame(df, 30, **options)
+
+    yearly = pd.concat(iter_amortization_chunks(df, 30, chunk_scenarios=7), ignore_index=True)
+    pd.testing.assert_frame_equal(yearly, pd.concat(iter_schedule_chunks(df, schedule), ignore_index=True))
+    monthly = pd.concat(iter_monthly_chunks(df, 30, chunk_scenarios=7, **options), ignore_index=True)
+    pd.testing.assert_frame_equal(monthly, pd.concat(iter_schedule_chunks(df, schedule, monthly=True), ignore_index=True))
+
+
+# --- Result cache ---
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_result_cache_is_bounded_by_memory():
+    cache = ResultCache(max_entries=10, max_bytes=3 * 8000)
+    for key in "abcd":
+        cache.put(key, np.zeros(1000))
+    assert cache.get("a") is None
+    assert all(cache.get(key) is not None for key in "bcd")
+    # Values larger than the whole budget are not cached and evict nothing
+    cache.put("big", np.zeros(10_000))
+    assert cache.get("big") is None
+    assert all(cache.get(key) is not None for key in "bcd")
+
+
+def test_result_cache_get_or_compute_computes_once():
+    cache = ResultCache()
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute("key", lambda: calls.append(1) or "value") == "value"
+    assert len(calls) == 1
+
+
+def test_result_cache_counts_bytes():
+    cache = ResultCache(max_bytes=1000)
+    cache.put("a", b"x" * 600)
+    cache.put("b", b"x" * 600)
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+
+# --- Export ---
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_export_chunks_round_trip(tmp_path, file_format):
+    df = pd.DataFrame({
+        "Loan ID": np.arange(1, 1001),
+        "Interest Rate %": np.round(np.linspace(3, 7, 1000), 3),
+        "Total Interest $": np.arange(1000) * 1234,
+    })
+    chunks = [df.iloc[:0], *iter_frame_chunks(df, 128)]
+    path = tmp_path / f"export.{file_format}"
+    assert export_chunks(chunks, path) == len(df)
+    written = pd.read_parquet(path) if file_format == "parquet" else pd.read_csv(path)
+    pd.testing.assert_frame_equal(written, df)
+
+    buffer = io.BytesIO()
+    assert export_chunks(iter_frame_chunks(df, 300), buffer, file_format) == len(df)
+    buffer.seek(0)
+    written = pd.read_parquet(buffer) if file_format == "parquet" else pd.read_csv(buffer)
+    pd.testing.assert_frame_equal(written, df)
@@ -0,0 +1,34 @@
+"""Monte Carlo stress test: chunking invariance and the zero-volatility closed form."""
+import numpy as np
+
+from mortgage_engine import calculate_monthly_payment, cumulative_interest, months_until_ltv_80
+from mortgage_montecarlo import SIMULATION_METRICS, simulate_scenarios
+
+rng = np.random.default_rng(7)
+PRICES = rng.uniform(200_000, 900_000, 30)
+LOANS = PRICES * rng.uniform(0.75, 0.97, 30)
+RATES = rng.uniform(0.03, 0.08, 30)
+PMI = np.where(LOANS > PRICES * 0.8, LOANS * 0.005 / 12, 0.0)
+
+
+def test_results_do_not_depend_on_memory_limit():
+    options = dict(n_paths=300, path_block=128, seed=11, rate_volatility=0.015, refi_probability=0.2,
+                   annual_sale_rate=0.05, arm_fixed_years=5, extra_principal=50.0)
+    one_chunk = simulate_scenarios(LOANS, RATES, PRICES, PMI, 30, memory_limit_mb=64, **options)
+    # Small enough for one scenario per chunk
+    many_chunks = simulate_scenarios(LOANS, RATES, PRICES, PMI, 30, memory_limit_mb=0.01, **options)
+    for key, values in one_chunk.items():
+        np.testing.assert_array_equal(many_chunks[key], values, err_msg=key)
+
+
+def test_zero_volatility_matches_closed_form():
+    results = simulate_scenarios(LOANS, RATES, PRICES, PMI, 30, n_paths=20, horizon_years=10,
+                                 rate_volatility=0.0, percentiles=(5, 95))
+    payment = calculate_monthly_payment(LOANS, RATES, 30)
+    interest, balance = cumulative_interest(LOANS, RATES, payment, 120)
+    pmi_months = np.where(PMI > 0, np.minimum(months_until_ltv_80(PRICES, LOANS, RATES, 30), 120), 0)
+    expected = dict(zip(SIMULATION_METRICS, (interest, pmi_months, balance)))
+    for metric, values in expected.items():
+        for band in results[metric]:
+            np.testing.assert_allclose(band, values, rtol=1e-9, atol=1e-4, err_msg=metric)
+    assert (results["Refinanced %"] == 0).all() and (results["Sold %"] == 0).all()
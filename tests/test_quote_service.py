@@ -0,0 +1,110 @@
+"""Quote service batching: per-request options, shared loan analysis and error responses."""
+import asyncio
+
+import numpy as np
+import pytest
+
+from mortgage_engine import loan_details_table, profile_scenarios
+from quote_service import QuoteService, normalize_request, quote_batch
+
+PROFILE = {
+    "home_price": 300000, "interest_rate_pct": 6, "max_dti_pct": 43, "annual_income": 120000,
+    "cash_available": 80000, "hoa": 250, "property_tax_pct": 1.2, "insurance_pct": 0.5, "pmi_pct": 0.5,
+}
+
+
+def quote(payload):
+    return quote_batch([normalize_request(payload)[1]])[0]
+
+
+def test_quote_matches_profile_scenarios():
+    expected = profile_scenarios(PROFILE)
+    response = quote({**PROFILE, "top": 3})
+    assert response["feasible_scenarios"] == len(expected)
+
+    cheapest = loan_details_table(expected.nsmallest(3, "Total Monthly $", keep="first"))
+    assert [row["Scenario"] for row in response["scenarios"]] == cheapest.index.tolist()
+    for column in ("Total Monthly $", "Total Interest $", "PMI Months", "Total PMI Paid $"):
+        np.testing.assert_allclose([row[column] for row in response["scenarios"]], cheapest[column], err_msg=column)
+
+
+def test_batch_keeps_per_request_options():
+    requests = [{**PROFILE, "pmi_cancel_ltv_pct": 78, "top": 4}, {**PROFILE, "home_price": 250000},
+                {**PROFILE, "loan_analysis": False, "top": 2}]
+    batched = quote_batch([normalize_request(payload)[1] for payload in requests])
+    assert batched == [quote(payload) for payload in requests]
+    assert "PMI Months" not in batched[2]["scenarios"][0]
+
+
+def test_invalid_profile_returns_error():
+    response = quote({"home_price": 0})
+    assert "home_price" in response["error"]
+
+
+def test_cache_key_ignores_field_order_and_int_float():
+    assert normalize_request(dict(reversed(PROFILE.items())))[0] == normalize_request(PROFILE)[0]
+    assert normalize_request({**PROFILE, "hoa": 250.0})[0] == normalize_request(PROFILE)[0]
+    assert normalize_request({**PROFILE, "top": 6})[0] != normalize_request(PROFILE)[0]
+
+
+@pytest.mark.parametrize("payload", [[PROFILE], {**PROFILE, "top": 0}, {**PROFILE, "pmi_cancel_ltv_pct": 90},
+                                     {**PROFILE, "hoa": "250"}])
+def test_bad_requests_raise_value_error(payload):
+    with pytest.raises(ValueError):
+        normalize_request(payload)
+
+
+@pytest.mark.parametrize("payload", [
+    {**PROFILE, "down_payment_step_pct": 0}, {**PROFILE, "max_discount_points": -1}, {**PROFILE, "loan_term": 0},
+    {**PROFILE, "pmi_percent": 0.5}, {**PROFILE, "top": True}, {**PROFILE, "hoa": True},
+    {**PROFILE, "loan_analysis": "yes"}, {**PROFILE, "profile_id": [1]},
+])
+def test_out_of_range_and_unknown_fields_raise_value_error(payload):
+    with pytest.raises(ValueError):
+        normalize_request(payload)
+
+
+def test_one_failing_request_does_not_fail_its_batch():
+    good = normalize_request(PROFILE)[1]
+    # Skips request validation, as a pricing bug would
+    bad = {**good, "profile": {**PROFILE, "down_payment_step_pct": 0}}
+    responses = quote_batch([good, bad])
+    assert responses[0] == quote(PROFILE)
+    assert "error" in responses[1]
+
+
+def test_profile_id_is_echoed_but_not_part_of_the_cache_key():
+    assert normalize_request({**PROFILE, "profile_id": "a"}) == normalize_request(PROFILE)
+
+    async def run():
+        service = QuoteService(workers=1, max_wait_ms=1)
+        await service.start()
+        try:
+            return await service.quote({**PROFILE, "profile_id": "a"}), await service.quote(PROFILE)
+        finally:
+            await service.stop()
+
+    tagged, untagged = asyncio.run(run())
+    assert tagged == {"profile_id": "a", **untagged}
+
+
+def test_service_recovers_from_a_broken_pool():
+    async def run():
+        service = QuoteService(workers=1, max_wait_ms=1)
+        await service.start()
+        try:
+            assert "scenarios" in await service.quote(PROFILE)
+            # Kill the worker process out from under the pool
+            for process in list(service._pool._processes.values()):
+                process.kill()
+                process.join()
+            response = await service.quote({**PROFILE, "home_price": 310000})
+            return response, service.health()
+        finally:
+            await service.stop()
+
+    response, health = asyncio.run(run())
+    assert "scenarios" in response
+    assert health["status"] == "ok"
+    assert health["pool_restarts"] == 1
+    assert "BrokenProcessPool" in health["last_pool_error"]
@@ -0,0 +1,40 @@
+"""Affordability sweep: shared-memory workers match the serial sweep and the per-cell scenario search."""
+from itertools import product
+
+import numpy as np
+
+from mortgage_engine import build_scenario_grid, filter_scenarios
+from mortgage_sweep import affordability_sweep, sweep_frame
+
+PARAMS = dict(
+    loan_term=30, max_discount_points=4, min_down_pct=0.05, max_down_pct=0.30, property_tax_rate=0.012,
+    insurance_rate=0.005, pmi_rate=0.005, hoa=250, cash_available=90_000, monthly_liability=500,
+    monthly_income=120_000 / 12, max_dti=0.40, max_monthly_expense=None,
+)
+PRICES = np.arange(200_000, 700_001, 50_000)
+RATES = np.arange(0.04, 0.081, 0.01)
+
+
+def test_parallel_sweep_matches_serial():
+    serial = affordability_sweep(PRICES, RATES, **PARAMS, workers=1)
+    parallel = affordability_sweep(PRICES, RATES, **PARAMS, workers=2, min_parallel_scenarios=0)
+    np.testing.assert_array_equal(parallel, serial)
+    assert (serial[..., 0] > 0).any() and (serial[..., 0] == 0).any()
+
+
+def test_sweep_matches_scenario_search():
+    df = sweep_frame(affordability_sweep(PRICES, RATES, **PARAMS, workers=1), PRICES, RATES)
+    constraints = [PARAMS[key] for key in ("cash_available", "monthly_liability", "monthly_income",
+                                           "max_dti", "max_monthly_expense")]
+    # sweep_frame rows are rate-major, like product(RATES, PRICES)
+    for row, (rate, price) in zip(df.itertuples(index=False), product(RATES, PRICES)):
+        grid = build_scenario_grid(
+            price, rate, PARAMS["loan_term"], PARAMS["max_discount_points"], PARAMS["min_down_pct"],
+            PARAMS["max_down_pct"], PARAMS["property_tax_rate"], PARAMS["insurance_rate"], PARAMS["pmi_rate"],
+            PARAMS["hoa"],
+        )
+        scenarios = filter_scenarios(grid, *constraints)
+        assert row[2] == len(scenarios)
+        if len(scenarios):
+            assert row[3] == scenarios["Total Monthly $"].min()
+            assert row[8] == scenarios["Total Cash Used $"].min()